@@ -0,0 +1,84 @@
+import threading
+import time
+
+
+class TTLCache:
+    """
+    Small thread-safe in-process cache: each key expires `ttl_seconds`
+    after it was computed, or earlier when a write invalidates it.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}  # key -> (computed_at, value)
+        # Every invalidate() takes the next generation. A value whose key was
+        # invalidated while it was being computed is stale and is not stored.
+        self._generation = 0
+        self._cleared_at = 0  # Generation of the last invalidate-everything
+        self._invalidated_at = {}  # key -> generation of its last invalidation
+        self._lock = threading.Lock()
+
+    def _generation_of(self, key) -> tuple:
+        return self._cleared_at, self._invalidated_at.get(key, 0)
+
+    def _lookup(self, key, now: float):
+        """(hit, value, generation) under the lock."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl_seconds:
+                return True, entry[1], None
+            return False, None, self._generation_of(key)
+
+    def _store(self, key, now: float, value, generation):
+        with self._lock:
+            if self._generation_of(key) == generation:
+                self._prune(now)
+                self._entries[key] = (now, value)
+
+    def get_or_compute(self, key, compute):
+        now = time.monotonic()
+        hit, value, generation = self._lookup(key, now)
+        if hit:
+            return value
+
+        # Compute outside the lock so one slow metric doesn't block the others
+        value = compute()
+        self._store(key, now, value, generation)
+        return value
+
+    async def get_or_compute_async(self, key, compute):
+        """Same as get_or_compute for a coroutine function `compute`."""
+        now = time.monotonic()
+        hit, value, generation = self._lookup(key, now)
+        if hit:
+            return value
+
+        value = await compute()
+        self._store(key, now, value, generation)
+        return value
+
+    def _prune(self, now: float):
+        # Per-day keys would otherwise pile up forever (caller holds the lock)
+        expired = [
+            k for k, (at, _) in self._entries.items() if now - at >= self.ttl_seconds
+        ]
+        for key in expired:
+            del self._entries[key]
+
+    def age(self, key):
+        """Seconds since `key` was computed (None if it isn't cached)."""
+        with self._lock:
+            entry = self._entries.get(key)
+        return None if entry is None else time.monotonic() - entry[0]
+
+    def invalidate(self, *keys):
+        """Drops the given keys, or everything when called without keys."""
+        with self._lock:
+            self._generation += 1
+            if not keys:
+                self._cleared_at = self._generation
+                self._entries.clear()
+                self._invalidated_at.clear()  # Superseded by _cleared_at
+            for key in keys:
+                self._invalidated_at[key] = self._generation
+                self._entries.pop(key, None)
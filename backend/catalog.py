@@ -0,0 +1,80 @@
+import hashlib
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from database import Product, CatalogVersion
+
+PRODUCT_FIELDS = {
+    "id": Product.id,
+    "name": Product.name,
+    "category": Product.category,
+    "base_price": Product.base_price,
+    "stock": Product.stock,
+}
+MAX_PAGE_SIZE = 1000
+
+
+def catalog_version_query():
+    return select(CatalogVersion.version).where(CatalogVersion.id == 1)
+
+
+def current_catalog_version(db: Session) -> int:
+    return db.execute(catalog_version_query()).scalar() or 0
+
+
+def catalog_version_bump():
+    return (
+        update(CatalogVersion)
+        .where(CatalogVersion.id == 1)
+        .values(version=CatalogVersion.version + 1)
+    )
+
+
+def bump_catalog_version(db: Session):
+    """Call inside the same DB transaction as any write to `products`."""
+    db.execute(catalog_version_bump())
+
+
+def catalog_etag(version: int, query_string: str) -> str:
+    # Different pages/projections of the same catalog version get different tags
+    digest = hashlib.sha1(query_string.encode()).hexdigest()[:12]
+    return f'W/"catalog-{version}-{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    """
+    RFC 9110 If-None-Match: "*" or any listed tag, compared weakly
+    (W/"x" equals "x"), never by substring.
+    """
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
+
+
+def products_page_query(fields, categories=None, after_id=None, limit=None):
+    """
+    Keyset page of the catalog: rows with id > after_id, ordered by id,
+    projected to `fields` (always includes id so clients can page on).
+    """
+    columns = [PRODUCT_FIELDS["id"]] + [PRODUCT_FIELDS[f] for f in fields if f != "id"]
+    query = select(*columns).order_by(Product.id)
+    if categories:
+        query = query.where(Product.category.in_(categories))
+    if after_id is not None:
+        query = query.where(Product.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+def list_products(
+    db: Session, fields, categories=None, after_id=None, limit=None
+) -> list:
+    query = products_page_query(fields, categories, after_id, limit)
+    return [dict(row._mapping) for row in db.execute(query)]
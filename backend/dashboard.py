@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+
+from sqlalchemy import select, func, desc
+
+from database import Product, DailyProductSales
+
+# Executive dashboard metrics. All date filters are plain ranges on the
+# indexed rollup `day` column.
+
+
+def today_revenue_query(today: date):
+    # A. Total Revenue Today
+    return (
+        select(func.sum(DailyProductSales.revenue))
+        .where(DailyProductSales.day >= today)
+        .where(DailyProductSales.day < today + timedelta(days=1))
+    )
+
+
+def revenue_trend_query(today: date):
+    # B. Revenue Trend (Last 7 Days)
+    # This creates the data for the Line Chart
+    return (
+        select(
+            DailyProductSales.day.label("date"),
+            func.sum(DailyProductSales.revenue).label("revenue"),
+        )
+        .where(DailyProductSales.day >= today - timedelta(days=7))
+        .where(DailyProductSales.day < today + timedelta(days=1))
+        .group_by(DailyProductSales.day)
+        .order_by(DailyProductSales.day)
+    )
+
+
+def revenue_trend_rows(trend_data) -> list:
+    # Format for Frontend: [{"date": "2023-10-01", "revenue": 1200}, ...]
+    return [{"date": str(t.date), "revenue": t.revenue} for t in trend_data]
+
+
+def top_products_query():
+    # C. Top 5 Products
+    # This creates the data for the Bar Chart
+    return (
+        select(Product.name, func.sum(DailyProductSales.quantity).label("sold"))
+        .join(DailyProductSales, Product.id == DailyProductSales.product_id)
+        .group_by(Product.name)
+        .order_by(desc("sold"))
+        .limit(5)
+    )
+
+
+def top_products_rows(top_products) -> list:
+    return [{"name": p.name, "sold": p.sold} for p in top_products]
@@ -1,15 +1,21 @@
+import contextvars
 import os
+import threading
+import time
 from sqlalchemy import (
     create_engine,
+    event,
     Column,
     Integer,
     String,
     Float,
+    Date,
     DateTime,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, sessionmaker, relationship
 
 # --- 1. SMART CONNECTION LOGIC (SQLite vs Postgres) ---
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./optistock.db")
@@ -20,17 +26,163 @@ if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
         "postgres://", "postgresql://", 1
     )
 
+# --- 1a. ENGINE PROFILES (tuned per backend) ---
+IS_SQLITE = "sqlite" in SQLALCHEMY_DATABASE_URL
+
+# SQLite: WAL lets dashboard reads run while a checkout is writing
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # Durable enough with WAL, far fewer fsyncs
+    "cache_size": -64000,  # Negative = KiB, i.e. 64 MB page cache
+    "mmap_size": 268435456,  # 256 MB memory-mapped reads
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,  # Wait for the writer instead of failing
+}
+
+# Postgres: sized pool, dead connections detected before use
+POSTGRES_POOL = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": True,
+}
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+# Stamped when a session is about to ask the pool for a connection; the
+# pool `checkout` listener turns it into the time spent waiting.
+_checkout_requested = contextvars.ContextVar(
+    "optistock_checkout_requested", default=None
+)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _stamp_checkout_request(orm_execute_state):
+    # No transaction yet: this statement autobegins and checks out a connection
+    if not orm_execute_state.session.in_transaction():
+        _checkout_requested.set(time.perf_counter())
+
+
+class PoolStats:
+    """Counters and checkout wait times, all fed by pool events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def on_checkout(self, *_):
+        self.count("checkouts")
+        requested = _checkout_requested.get()
+        if requested is not None:  # Checkouts outside a Session are only counted
+            _checkout_requested.set(None)
+            self.record_wait(time.perf_counter() - requested)
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.waits += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def snapshot(self, db_engine) -> dict:
+        pool = db_engine.pool
+        with self._lock:
+            return {
+                "pool": pool.__class__.__name__,
+                "status": pool.status(),
+                "checked_out": (
+                    pool.checkedout() if hasattr(pool, "checkedout") else None
+                ),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "avg_wait_ms": (
+                    round(1000 * self.wait_seconds_total / self.waits, 3)
+                    if self.waits
+                    else 0.0
+                ),
+                "max_wait_ms": round(1000 * self.wait_seconds_max, 3),
+            }
+
+
+def instrument_engine(db_engine, stats: PoolStats):
+    """Applies the backend profile hooks and pool counters to an engine."""
+    if IS_SQLITE:
+        event.listen(db_engine, "connect", apply_sqlite_pragmas)
+    event.listen(db_engine, "connect", lambda *_: stats.count("connects"))
+    event.listen(db_engine, "checkout", stats.on_checkout)
+    event.listen(db_engine, "checkin", lambda *_: stats.count("checkins"))
+
+
+def engine_options() -> dict:
+    if IS_SQLITE:
+        return {}
+    return dict(POSTGRES_POOL)
+
+
 # Create Engine
-if "sqlite" in SQLALCHEMY_DATABASE_URL:
+if IS_SQLITE:
     engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        },
     )
 else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options())
+
+POOL_STATS = PoolStats()
+instrument_engine(engine, POOL_STATS)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- 1b. OPTIONAL ASYNC ENGINE (DB_MODE=async) ---
+# asyncpg for Postgres, aiosqlite locally. The sync engine above stays
+# available for background jobs, migrations and scripts.
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+ASYNC_DB = DB_MODE == "async"
+
+
+def async_database_url(url: str) -> str:
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+async_engine = None
+AsyncSessionLocal = None
+ASYNC_POOL_STATS = PoolStats()
+
+if ASYNC_DB:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+    async_engine = create_async_engine(
+        async_database_url(SQLALCHEMY_DATABASE_URL), **engine_options()
+    )
+    instrument_engine(async_engine.sync_engine, ASYNC_POOL_STATS)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
 
 def get_db():
     db = SessionLocal()
@@ -40,6 +192,19 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def pool_stats() -> dict:
+    stats = {"backend": "sqlite" if IS_SQLITE else "postgresql"}
+    stats["sync"] = POOL_STATS.snapshot(engine)
+    if async_engine is not None:
+        stats["async"] = ASYNC_POOL_STATS.snapshot(async_engine.sync_engine)
+    return stats
+
+
 # --- 2. RESTORED MODELS (The missing part) ---
 
 
@@ -71,3 +236,71 @@ class Transaction(Base):
     quantity = Column(Integer)
     timestamp = Column(DateTime)
     total_price = Column(Float)
+
+    # Composite indexes for the hot paths (forecast history, RFM, date ranges).
+    # Existing databases get them through migrations.py.
+    __table_args__ = (
+        Index("ix_transactions_product_timestamp", "product_id", "timestamp"),
+        Index("ix_transactions_customer_timestamp", "customer_id", "timestamp"),
+        Index("ix_transactions_timestamp", "timestamp"),
+    )
+
+
+class DailyProductSales(Base):
+    # Rollup of `transactions`: units and revenue per product per day.
+    # Kept in sync by /pos/checkout; rebuilt with `python rollups.py --backfill`.
+    __tablename__ = "daily_product_sales"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    quantity = Column(Integer, default=0)
+    revenue = Column(Float, default=0.0)
+
+
+class CatalogVersion(Base):
+    # Single-row counter bumped by every write that changes `products`.
+    # GET /products turns it into an ETag so unchanged catalogs return 304.
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=1, nullable=False)
+
+
+class ReorderReport(Base):
+    # Materialized output of the reorder engine (one row per product).
+    # Refreshed per product after sales/stock edits and fully on a timer.
+    __tablename__ = "reorder_report"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    name = Column(String)
+    current_stock = Column(Integer)
+    predicted_demand = Column(Integer)
+    status = Column(String, index=True)  # CRITICAL, LOW or OK
+    recommended_order = Column(Integer)
+    computed_at = Column(DateTime)
+
+
+class Job(Base):
+    # Persistent queue for slow background work (e.g. retraining), run by worker.py
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # "retrain", ...
+    status = Column(String, index=True)  # queued, running, succeeded, failed
+    progress = Column(Float, default=0.0)  # 0.0 - 1.0
+    message = Column(String)
+    # Equals `kind` while queued/running, NULL afterwards: UNIQUE = dedupe
+    active_key = Column(String, unique=True)
+    created_at = Column(DateTime)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class SchemaMigration(Base):
+    # One row per migration applied by migrations.py
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True)
+    description = Column(String)
+    applied_at = Column(DateTime)
@@ -0,0 +1,301 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, desc, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from database import Product, DailyProductSales, ReorderReport
+from metrics import timed
+from optistock.features import (
+    FEATURE_COLUMNS,
+    HISTORY_DAYS,
+    encode_categories,
+    serving_rows,
+)
+
+SAFETY_BUFFER = 5  # Units kept on top of the predicted demand
+
+
+def products_query(product_ids):
+    """id/name/category/price for every requested product in one query."""
+    return select(Product.id, Product.name, Product.category, Product.base_price).where(
+        Product.id.in_(product_ids)
+    )
+
+
+def products_frame(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["product_id", "name", "category", "base_price"])
+
+
+def fetch_products(db: Session, product_ids) -> pd.DataFrame:
+    return products_frame(db.execute(products_query(product_ids)).all())
+
+
+def recent_history_query(product_ids=None):
+    """
+    The last HISTORY_DAYS sales days of every requested product (or of the
+    whole catalog) from the daily rollup with ONE grouped query (ROW_NUMBER
+    over a per-product window) instead of one round trip per product. They
+    always contain every sale in the HISTORY_DAYS calendar days before the
+    last one.
+    """
+    ranked = select(
+        DailyProductSales.product_id,
+        DailyProductSales.quantity,
+        DailyProductSales.day,
+        func.row_number()
+        .over(
+            partition_by=DailyProductSales.product_id,
+            order_by=desc(DailyProductSales.day),
+        )
+        .label("rn"),
+    )
+    if product_ids is not None:
+        ranked = ranked.where(DailyProductSales.product_id.in_(product_ids))
+    ranked = ranked.subquery()
+    return select(ranked).where(ranked.c.rn <= HISTORY_DAYS)
+
+
+def history_frame(rows) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=["product_id", "quantity", "date", "rn"])
+
+
+def fetch_recent_history(db: Session, product_ids=None) -> pd.DataFrame:
+    return history_frame(db.execute(recent_history_query(product_ids)).all())
+
+
+def history_features(history: pd.DataFrame) -> pd.DataFrame:
+    """
+    One feature row per product for the day after its last sales day
+    (Time Travel: that day acts as "Yesterday"), via the shared
+    calendar-correct serving features. Used by /forecast/predict AND the
+    reorder report, so both score a product from the same features.
+    """
+    if history.empty:
+        return pd.DataFrame(columns=["lag_1"], index=pd.Index([], name="product_id"))
+    product_ids = history["product_id"].drop_duplicates().sort_values()
+    last_day = history[history["rn"] == 1].set_index("product_id")["date"]
+    return serving_rows(history, product_ids, last_day)
+
+
+def requested_ids(items) -> list:
+    return list(dict.fromkeys(i.product_id for i in items))
+
+
+def predict_batch(db: Session, models: dict, items) -> dict:
+    """
+    Scores many (product_id, price_override) requests with one product
+    query, one history query and a single model.predict call.
+    """
+    product_ids = requested_ids(items)
+    products = fetch_products(db, product_ids)
+    recent = fetch_recent_history(db, product_ids)
+    return score_requests(models, items, products, recent)
+
+
+def score_requests(models: dict, items, products, recent) -> dict:
+    """
+    The CPU half of predict_batch: features and one model.predict call over
+    already fetched `products` / `recent` history frames.
+    """
+    requests = pd.DataFrame(
+        {
+            "product_id": [i.product_id for i in items],
+            "price_override": [i.price_override for i in items],
+        }
+    )
+    with timed("forecast_features"):
+        history = history_features(recent)
+
+    frame = requests.merge(products, on="product_id", how="left", indicator=True).join(
+        history, on="product_id"
+    )
+    found = frame["_merge"] == "both"
+    not_found = sorted(set(frame.loc[~found, "product_id"].tolist()))
+    frame = frame[found]
+    has_history = frame["lag_1"].notna()
+
+    frame = frame.assign(
+        base_price=frame["price_override"].fillna(frame["base_price"]),
+        category_encoded=encode_categories(models["encoder"], frame["category"]),
+    )
+
+    predicted = np.zeros(len(frame), dtype=int)
+    scored = frame[has_history]
+    if not scored.empty:
+        with timed("forecast_inference"):
+            raw = models["forecast"].predict(scored[FEATURE_COLUMNS].astype(float))
+        predicted[has_history.to_numpy()] = np.maximum(0, np.round(raw)).astype(int)
+
+    predictions = [
+        {
+            "product_id": int(pid),
+            "predicted_sales": int(sales),
+            "confidence_score": 0.85 if ok else 0.0,
+            "product_name": name,
+        }
+        for pid, sales, ok, name in zip(
+            frame["product_id"], predicted, has_history, frame["name"]
+        )
+    ]
+    return {"predictions": predictions, "not_found": not_found}
+
+
+# --- CATALOG-WIDE (REORDER) FEATURES ---
+
+
+def score_catalog(db: Session, models: dict, product_ids=None) -> pd.DataFrame:
+    """
+    Scores the catalog (or just `product_ids`) with one products query, one
+    recent-history query and a single model.predict call, then applies the
+    restock rules to the resulting arrays. Returns every product, OK or not.
+    Each product is scored as of its own last sales day, exactly like
+    /forecast/predict; products that never sold predict 0.
+    """
+    query = select(
+        Product.id,
+        Product.name,
+        Product.category,
+        Product.base_price,
+        Product.stock,
+    ).order_by(Product.id)
+    if product_ids is not None:
+        query = query.where(Product.id.in_(list(product_ids)))
+
+    products = pd.DataFrame(
+        db.execute(query).all(),
+        columns=["product_id", "name", "category", "base_price", "stock"],
+    )
+    if products.empty:
+        return products
+
+    predicted = np.zeros(len(products), dtype=int)
+
+    if "forecast" in models and "encoder" in models:
+        recent = fetch_recent_history(db, product_ids)
+        with timed("forecast_features"):
+            features = products.join(history_features(recent), on="product_id")
+            has_history = features["lag_1"].notna().to_numpy()
+            features = features[has_history].assign(
+                category_encoded=lambda f: encode_categories(
+                    models["encoder"], f["category"]
+                ),
+            )
+        if has_history.any():
+            with timed("forecast_inference"):
+                raw = models["forecast"].predict(
+                    features[FEATURE_COLUMNS].astype(float)
+                )
+            predicted[has_history] = np.maximum(0, np.round(raw)).astype(int)
+
+    stock = products["stock"].fillna(0).astype(int).to_numpy()
+    required = predicted + SAFETY_BUFFER
+    status = np.select(
+        [stock < predicted, stock < required], ["CRITICAL", "LOW"], default="OK"
+    )
+
+    return pd.DataFrame(
+        {
+            "product_id": products["product_id"].astype(int),
+            "name": products["name"].fillna("Unknown Product"),  # Safe fallback
+            "current_stock": stock,
+            "predicted_demand": predicted,
+            "status": status,
+            "recommended_order": np.where(status == "OK", 0, required - stock),
+        }
+    )
+
+
+# --- MATERIALIZED REORDER REPORT ---
+
+
+def report_upsert(dialect_name: str):
+    """INSERT ... ON CONFLICT (product_id) for the active backend."""
+    dialect = sqlite if dialect_name == "sqlite" else postgresql
+    stmt = dialect.insert(ReorderReport)
+    return stmt.on_conflict_do_update(
+        index_elements=["product_id"],
+        set_={
+            column.name: stmt.excluded[column.name]
+            for column in ReorderReport.__table__.columns
+            if column.name != "product_id"
+        },
+    )
+
+
+def refresh_reorder_report(db: Session, models: dict, product_ids=None) -> int:
+    """
+    Recomputes the persisted reorder report.
+    With `product_ids` only those rows are rewritten (after a sale or stock
+    edit); without it the whole table is rebuilt. Rows are upserted, so two
+    overlapping refreshes never collide on the primary key. Returns rows
+    written; 0 when no forecast model is loaded, since every product would
+    otherwise be stored as "OK".
+    """
+    if "forecast" not in models or "encoder" not in models:
+        print("⚠️ Reorder report not refreshed: no forecast model loaded.")
+        return 0
+    if product_ids is not None:
+        product_ids = sorted(set(product_ids))
+        if not product_ids:
+            return 0
+
+    stage = "reorder_refresh" if product_ids is None else "reorder_refresh_partial"
+    with timed(stage):
+        scored = score_catalog(db, models, product_ids)
+        scored["computed_at"] = datetime.now()
+
+        if not scored.empty:
+            db.execute(
+                report_upsert(db.get_bind().dialect.name),
+                scored.to_dict(orient="records"),
+            )
+        # Rows of deleted products; every other row was just rewritten
+        stale = delete(ReorderReport).where(
+            ReorderReport.product_id.not_in(select(Product.id))
+        )
+        if product_ids is not None:
+            stale = stale.where(ReorderReport.product_id.in_(product_ids))
+        db.execute(stale)
+        db.commit()
+
+    return len(scored)
+
+
+def reorder_report_query():
+    # Only the flagged rows; the status index serves the IN
+    return (
+        select(ReorderReport)
+        .where(ReorderReport.status.in_(["CRITICAL", "LOW"]))
+        .order_by(ReorderReport.product_id)
+    )
+
+
+def report_rows(reports) -> list:
+    return [
+        {
+            "product_id": r.product_id,
+            "name": r.name,
+            "current_stock": r.current_stock,
+            "predicted_demand": r.predicted_demand,
+            "status": r.status,
+            "recommended_order": r.recommended_order,
+            "computed_at": r.computed_at,
+        }
+        for r in reports
+    ]
+
+
+def read_reorder_report(db: Session) -> list:
+    """O(1) read path for the dashboard: no inference, just the flagged rows."""
+    return report_rows(db.execute(reorder_report_query()).scalars())
+
+
+def any_report_row_query():
+    return select(ReorderReport.product_id).limit(1)
+
+
+def reorder_report_is_empty(db: Session) -> bool:
+    return db.execute(any_report_row_query()).first() is None
@@ -1,96 +1,257 @@
+import argparse
+import io
+import os
+import time
+
 import pandas as pd
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql, sqlite
+
 from database import SessionLocal, engine, Base, Product, Customer, Transaction
-from sqlalchemy import text
-import os
+from catalog import bump_catalog_version
+from rollups import backfill
+from migrations import upgrade
+from optistock.dataset import DATA_DIR, iter_table
 
+CHUNK_ROWS = int(os.getenv("LOAD_CHUNK_ROWS", "50000"))
 
-def init_db():
-    print("⚠️  WARNING: This will WIPE and RESET the Cloud Database.")
+# Dataset column -> DB column, and the dtypes each table is loaded with.
+# Nullable Int64 keeps integer columns integral when a cell is missing.
+TABLES = {
+    "products": {
+        "model": Product,
+        "rename": {},
+        "dtype": {
+            "id": "Int64",
+            "name": "string",
+            "category": "string",
+            "base_price": "float64",
+            "stock": "Int64",
+        },
+        # Owned by the live app (checkouts, stock edits): --incremental only
+        # sets it on new rows, never over an existing product's stock
+        "live": ["stock"],
+    },
+    "customers": {
+        "model": Customer,
+        "rename": {},
+        "dtype": {"id": "Int64", "name": "string", "email": "string"},
+    },
+    "transactions": {
+        "model": Transaction,
+        "rename": {"date": "timestamp", "total_amount": "total_price"},
+        "dtype": {
+            "id": "Int64",
+            "customer_id": "Int64",
+            "product_id": "Int64",
+            "quantity": "Int64",
+            "total_amount": "float64",
+            "total_price": "float64",
+        },
+    },
+}
 
-    # 1. DROP ALL TABLES (Clean Slate)
-    print("🔥 Dropping old tables...")
-    Base.metadata.drop_all(bind=engine)
 
-    # 2. CREATE NEW TABLES
-    print("🏗️  Creating new schema...")
-    Base.metadata.create_all(bind=engine)
+def read_chunks(name: str, data_dir: str, chunk_rows: int):
+    """Streams one dataset table as DataFrames of at most `chunk_rows` DB-ready rows."""
+    spec = TABLES[name]
+    columns = [c.name for c in spec["model"].__table__.columns]
+
+    for chunk in iter_table(name, chunk_rows, data_dir=data_dir):
+        chunk = chunk.astype({c: t for c, t in spec["dtype"].items() if c in chunk})
+        chunk = chunk.rename(columns=spec["rename"])
+        if "timestamp" in chunk.columns:
+            chunk["timestamp"] = pd.to_datetime(chunk["timestamp"])
+        yield chunk[[c for c in columns if c in chunk.columns]]
+
+
+def _records(chunk: pd.DataFrame) -> list:
+    """DataFrame -> executemany parameters, with NaN/NA as NULL."""
+    chunk = chunk.astype(object).where(chunk.notna(), None)
+    return chunk.to_dict(orient="records")
 
-    db = SessionLocal()
 
+def _upsert(conn, model, columns, live=()):
+    """
+    INSERT ... ON CONFLICT (id) DO UPDATE for the active backend.
+    `live` columns are inserted but never overwritten.
+    """
+    dialect = sqlite if conn.dialect.name == "sqlite" else postgresql
+    stmt = dialect.insert(model)
+    updated = [c for c in columns if c != "id" and c not in live]
+    if not updated:
+        return stmt.on_conflict_do_nothing(index_elements=["id"])
+    return stmt.on_conflict_do_update(
+        index_elements=["id"], set_={c: stmt.excluded[c] for c in updated}
+    )
+
+
+def _copy(conn, table: str, chunk: pd.DataFrame):
+    """Postgres COPY ... FROM STDIN of one chunk (the fastest bulk path)."""
+    buffer = io.StringIO()
+    chunk.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    cursor = conn.connection.cursor()
     try:
-        # --- LOAD DATA FRAMES ---
-        print("📂 Reading CSV files...")
-        products_df = pd.read_csv("../data/products.csv")
-        customers_df = pd.read_csv("../data/customers.csv")
-        transactions_df = pd.read_csv("../data/transactions.csv")
-
-        # --- 3. UPLOAD PRODUCTS ---
-        print(f"📦 Uploading {len(products_df)} Products...")
-        for _, row in products_df.iterrows():
-            db.add(
-                Product(
-                    id=int(row["id"]),
-                    name=str(row["name"]),
-                    category=str(row["category"]),
-                    base_price=float(row["base_price"]),
-                    stock=int(row["stock"]),
-                )
-            )
-        db.commit()  # Commit products first so IDs exist
-
-        # --- 4. UPLOAD CUSTOMERS ---
-        print(f"bust Uploading {len(customers_df)} Customers...")
-        for _, row in customers_df.iterrows():
-            db.add(
-                Customer(
-                    id=int(row["id"]), name=str(row["name"]), email=str(row["email"])
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(chunk.columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def load_table(
+    name: str,
+    data_dir: str,
+    chunk_rows: int,
+    incremental: bool,
+    keep=None,
+    use_copy: bool = False,
+):
+    """
+    Loads one dataset table chunk by chunk, one DB transaction per chunk.
+    `keep(chunk)` returns a boolean mask of rows to load (orphan filter).
+    `use_copy` switches full Postgres loads to COPY. Returns (loaded, skipped).
+    """
+    model = TABLES[name]["model"]
+    live = TABLES[name].get("live", ())
+    loaded = skipped = 0
+    started = time.perf_counter()
+
+    for chunk in read_chunks(name, data_dir, chunk_rows):
+        if keep is not None:
+            mask = keep(chunk)
+            skipped += int((~mask).sum())
+            chunk = chunk[mask]
+        if chunk.empty:
+            continue
+
+        with engine.begin() as conn:
+            if use_copy:
+                _copy(conn, name, chunk)
+            elif incremental:
+                upsert = _upsert(conn, model, chunk.columns, live)
+                conn.execute(upsert, _records(chunk))
+            else:
+                conn.execute(model.__table__.insert(), _records(chunk))
+
+        loaded += len(chunk)
+        rate = loaded / max(time.perf_counter() - started, 1e-9)
+        print(f"   ... {name}: {loaded:,} rows ({rate:,.0f} rows/s)", flush=True)
+
+    return loaded, skipped
+
+
+def reset_sequences():
+    """Dataset ids are explicit; move Postgres sequences past them for new rows."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in TABLES:
+            conn.execute(
+                text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
                 )
             )
-        db.commit()  # Commit customers first so IDs exist
 
-        # --- 5. CLEAN & UPLOAD TRANSACTIONS ---
-        print("🧹 Cleaning Transactions...")
 
-        # A. Rename 'date' to 'timestamp' to match your DB Model
-        if "date" in transactions_df.columns:
-            transactions_df = transactions_df.rename(columns={"date": "timestamp"})
+def init_db(
+    data_dir: str = DATA_DIR,
+    chunk_rows: int = CHUNK_ROWS,
+    incremental: bool = False,
+    use_copy: bool = False,
+):
+    if use_copy and (engine.dialect.name != "postgresql" or incremental):
+        raise ValueError("COPY only works for full loads into Postgres.")
 
-        # B. Get list of valid IDs from the DB
-        # (We rely on the dataframes we just uploaded)
-        valid_product_ids = set(products_df["id"])
-        valid_customer_ids = set(customers_df["id"])
+    if incremental:
+        print("🔁 Incremental load: upserting dataset rows into the existing database.")
+    else:
+        print("⚠️  WARNING: This will WIPE and RESET the Cloud Database.")
 
-        # C. Filter: Keep only transactions where Customer AND Product actually exist
-        initial_count = len(transactions_df)
-        transactions_df = transactions_df[
-            transactions_df["product_id"].isin(valid_product_ids)
-            & transactions_df["customer_id"].isin(valid_customer_ids)
-        ]
-        removed_count = initial_count - len(transactions_df)
+        # 1. DROP ALL TABLES (Clean Slate)
+        print("🔥 Dropping old tables...")
+        Base.metadata.drop_all(bind=engine)
 
+    # 2. CREATE (OR UPGRADE) THE SCHEMA through the same migrations as deploys
+    print("🏗️  Migrating schema...")
+    upgrade(engine)
+
+    started = time.perf_counter()
+    db = SessionLocal()
+
+    try:
+        # --- 3. UPLOAD PRODUCTS & CUSTOMERS (before the rows that reference them) ---
+        print("📦 Uploading Products...")
+        load_table("products", data_dir, chunk_rows, incremental, use_copy=use_copy)
+        print("👤 Uploading Customers...")
+        load_table("customers", data_dir, chunk_rows, incremental, use_copy=use_copy)
+
+        # --- 4. UPLOAD TRANSACTIONS ---
+        # Keep only transactions whose Customer AND Product actually exist
+        valid_product_ids = set(db.scalars(select(Product.id)))
+        valid_customer_ids = set(db.scalars(select(Customer.id)))
+
+        def has_parents(chunk):
+            return (
+                chunk["product_id"].isin(valid_product_ids).fillna(False)
+                & chunk["customer_id"].isin(valid_customer_ids).fillna(False)
+            ).astype(bool)
+
+        print("💳 Uploading Transactions...")
+        loaded, removed_count = load_table(
+            "transactions",
+            data_dir,
+            chunk_rows,
+            incremental,
+            keep=has_parents,
+            use_copy=use_copy,
+        )
         if removed_count > 0:
             print(
                 f"   ⚠️ Removed {removed_count} orphan transactions (missing customer/product)."
             )
+        reset_sequences()
 
-        # D. Convert date string to Python DateTime object
-        transactions_df["timestamp"] = pd.to_datetime(transactions_df["timestamp"])
-
-        print(f"💳 Uploading {len(transactions_df)} Valid Transactions...")
+        # --- 5. Build the daily sales rollup used by the analytics endpoints ---
+        print("📊 Building daily sales rollup...")
+        backfill(db)
 
-        # E. Bulk Insert
-        trans_data = transactions_df.to_dict(orient="records")
-        db.bulk_insert_mappings(Transaction, trans_data)
+        if incremental:
+            # Product rows changed under cached /products responses
+            bump_catalog_version(db)
+            db.commit()
 
-        db.commit()
-        print("✅ SUCCESS: Database fully synced and clean!")
+        elapsed = time.perf_counter() - started
+        print(f"✅ SUCCESS: {loaded:,} transactions loaded in {elapsed:.1f}s.")
 
     except Exception as e:
         print(f"❌ ERROR: {e}")
         db.rollback()
+        raise  # A failed load must not look like a successful one (exit code 1)
     finally:
         db.close()
 
 
 if __name__ == "__main__":
-    init_db()
+    parser = argparse.ArgumentParser(
+        description="Load the dataset (Parquet or CSV) into the DB."
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Upsert rows by id instead of dropping and recreating every table.",
+    )
+    parser.add_argument(
+        "--copy",
+        action="store_true",
+        help="Postgres full loads only: bulk load with COPY instead of INSERT.",
+    )
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    init_db(args.data_dir, args.chunk_rows, args.incremental, args.copy)
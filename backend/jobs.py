@@ -0,0 +1,138 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import Job
+
+# Workers beat this often while a job runs, including during long fits
+HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+# A "running" job that missed this many heartbeats in a row is given up
+MISSED_HEARTBEATS = 4
+STALE_AFTER = timedelta(seconds=HEARTBEAT_SECONDS * MISSED_HEARTBEATS)
+
+
+def job_to_dict(job: Job) -> dict:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def enqueue(db: Session, kind: str) -> Job:
+    """
+    Queues a job, or returns the queued/running job of the same kind.
+    `active_key` is UNIQUE while a job is active, so two concurrent
+    requests can't both enqueue a retrain.
+    """
+    active = db.query(Job).filter(Job.active_key == kind).first()
+    if active is not None:
+        return active
+
+    job = Job(
+        kind=kind,
+        status="queued",
+        progress=0.0,
+        message="Waiting for a worker",
+        active_key=kind,
+        created_at=datetime.now(),
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # Someone else queued it first
+        return db.query(Job).filter(Job.active_key == kind).one()
+    return job
+
+
+def enqueue_if_due(db: Session, kind: str, every: timedelta):
+    """
+    Queues a periodic job unless one of the same kind was created within
+    `every`. Every worker may call this; `enqueue` keeps it to one active job.
+    """
+    last = db.execute(
+        select(Job.created_at).where(Job.kind == kind).order_by(Job.id.desc()).limit(1)
+    ).scalar()
+    if last is not None and datetime.now() - last < every:
+        return None
+    return enqueue(db, kind)
+
+
+def claim_next(db: Session):
+    """
+    Atomically moves the oldest queued job to "running" and returns it
+    (None when the queue is empty). Safe with several workers polling.
+    """
+    _fail_stale_jobs(db)
+
+    job_ids = db.execute(
+        select(Job.id).where(Job.status == "queued").order_by(Job.id).limit(5)
+    ).scalars()
+    for job_id in job_ids:
+        now = datetime.now()
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(status="running", started_at=now, heartbeat_at=now)
+        )
+        db.commit()
+        if claimed.rowcount == 1:
+            return db.get(Job, job_id)
+    return None
+
+
+def report_progress(db: Session, job_id: int, fraction: float, message: str):
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(progress=fraction, message=message, heartbeat_at=datetime.now())
+    )
+    db.commit()
+
+
+def heartbeat(db: Session, job_id: int):
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == "running")
+        .values(heartbeat_at=datetime.now())
+    )
+    db.commit()
+
+
+def finish(db: Session, job_id: int, succeeded: bool, message: str):
+    db.execute(
+        update(Job)
+        .where(Job.id == job_id)
+        .values(
+            status="succeeded" if succeeded else "failed",
+            progress=1.0 if succeeded else Job.progress,
+            message=message,
+            finished_at=datetime.now(),
+            active_key=None,  # Frees the slot for the next job of this kind
+        )
+    )
+    db.commit()
+
+
+def _fail_stale_jobs(db: Session):
+    cutoff = datetime.now() - STALE_AFTER
+    db.execute(
+        update(Job)
+        .where(Job.status == "running", Job.heartbeat_at < cutoff)
+        .values(
+            status="failed",
+            message="Worker stopped responding",
+            finished_at=datetime.now(),
+            active_key=None,
+        )
+    )
+    db.commit()
@@ -1,24 +1,101 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import (
+    FastAPI,
+    HTTPException,
+    Depends,
+    BackgroundTasks,
+    Query,
+    Request,
+    Response,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from sqlalchemy import func, desc, text
-import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, Field
+from sqlalchemy import func, desc, select, update, insert, case
 import numpy as np
-import pickle
 import os
+import time
 from datetime import datetime
+from typing import Optional
 
 # Add these imports at the top
 from sqlalchemy import func
-from datetime import timedelta, date
-
 
 # Import our local modules
-from database import SessionLocal, engine, Transaction, Product
+from database import (
+    ASYNC_DB,
+    get_db,
+    get_async_db,
+    pool_stats,
+    SessionLocal,
+    engine,
+    async_engine,
+    Transaction,
+    Product,
+    Customer,
+    ReorderReport,
+    Job,
+)
 import schemas
-from sklearn.ensemble import GradientBoostingRegressor
-from sklearn.preprocessing import LabelEncoder
+from segmentation import (
+    customer_rfm,
+    customer_rfm_query,
+    rfm_from_row,
+    predict_clusters,
+    label_segments,
+    score_all_customers,
+)
+from model_registry import MODEL_REGISTRY, current_models
+from cache import TTLCache
+from metrics import (
+    METRICS,
+    Gauge,
+    REQUEST_SECONDS,
+    REQUEST_DB_QUERIES,
+    REQUEST_DB_SECONDS,
+    begin_request,
+    instrument_queries,
+)
+import query_profiler
+from catalog import (
+    PRODUCT_FIELDS,
+    MAX_PAGE_SIZE,
+    list_products,
+    products_page_query,
+    current_catalog_version,
+    catalog_version_query,
+    bump_catalog_version,
+    catalog_version_bump,
+    catalog_etag,
+    etag_matches,
+)
+from dashboard import (
+    today_revenue_query,
+    revenue_trend_query,
+    revenue_trend_rows,
+    top_products_query,
+    top_products_rows,
+)
+from jobs import enqueue, job_to_dict
+from worker import start_embedded_worker
+from rollups import record_sales, sales_rows, sales_upsert
+from forecasting import (
+    predict_batch,
+    requested_ids,
+    products_query,
+    products_frame,
+    recent_history_query,
+    history_frame,
+    score_requests,
+    refresh_reorder_report,
+    read_reorder_report,
+    reorder_report_query,
+    report_rows,
+    reorder_report_is_empty,
+    any_report_row_query,
+)
 
 # Initialize App
 app = FastAPI(title="OptiStock AI Engine", version="1.0")
@@ -30,10 +107,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the browser frontend read the caching and pagination headers
+    expose_headers=["ETag", "X-Next-After-Id", "X-Report-Computed-At"],
 )
 
+# --- REQUEST METRICS (scraped from /metrics) ---
+for db_engine in [engine] + ([async_engine.sync_engine] if async_engine else []):
+    instrument_queries(db_engine)
+    query_profiler.profile_engine(db_engine)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    stats = begin_request()  # The endpoint's SQL statements add up in here
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/products/{product_id}), not the raw path,
+        # so the number of series stays bounded
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        elapsed = time.perf_counter() - started
+        REQUEST_SECONDS.observe(elapsed, request.method, path, str(status))
+        REQUEST_DB_QUERIES.observe(stats.queries, path)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, path)
+
+
+@app.middleware("http")
+async def profile_sql_queries(request: Request, call_next):
+    # Opt-in (SQL_PROFILE=1, or an open assert_query_budget): flags N+1
+    # patterns and slow statements, and reports the totals as headers
+    if not query_profiler.enabled():
+        return await call_next(request)
+
+    with query_profiler.profile_queries(
+        f"{request.method} {request.url.path}"
+    ) as profile:
+        response = await call_next(request)
+    query_profiler.report(profile)
+    response.headers["X-Query-Count"] = str(profile.count)
+    response.headers["X-Query-Time-Ms"] = f"{profile.seconds * 1000:.1f}"
+    return response
+
+
 # --- GLOBAL VARIABLES (The Brains) ---
-MODELS = {}
+# Models live in MODEL_REGISTRY (model_registry.py). Each request takes ONE
+# immutable snapshot with current_models(), so all models it uses match.
+
+# Where retrain jobs run: "embedded" worker process or an "external" worker.py
+RETRAIN_WORKER = os.getenv("RETRAIN_WORKER", "embedded").lower()
+
+# Executive dashboard metrics are served from memory for this long (seconds)
+DASHBOARD_CACHE = TTLCache(float(os.getenv("DASHBOARD_CACHE_SECONDS", "60")))
 
 
 # Define the data format for updating stock
@@ -48,110 +177,55 @@ class RestockRecommendation(BaseModel):
     predicted_demand: int
     status: str
     recommended_order: int
+    computed_at: Optional[datetime] = None  # When this row was last recomputed
 
 
 # --- LIFECYCLE: Load Models on Startup ---
 @app.on_event("startup")
 def load_models():
     print("Loading AI Models...")
-    base_path = "../ml-engine"
+    if MODEL_REGISTRY.refresh() is not None:
+        print(" -> SUCCESS: All models loaded.")
 
-    try:
-        # Load Segmentation Models
-        with open(f"{base_path}/kmeans_model.pkl", "rb") as f:
-            MODELS["kmeans"] = pickle.load(f)
-        with open(f"{base_path}/scaler.pkl", "rb") as f:
-            MODELS["scaler"] = pickle.load(f)
-        with open(f"{base_path}/model_metadata.pkl", "rb") as f:
-            MODELS["meta"] = pickle.load(f)
-
-        # Load Forecasting Models
-        with open(f"{base_path}/forecast_model.pkl", "rb") as f:
-            MODELS["forecast"] = pickle.load(f)
-        with open(f"{base_path}/category_encoder.pkl", "rb") as f:
-            MODELS["encoder"] = pickle.load(f)
 
-        print(" -> SUCCESS: All models loaded.")
-    except Exception as e:
-        print(f" -> ERROR: Could not load models. Check paths! {e}")
+@app.on_event("startup")
+def start_retrain_worker():
+    # "embedded": the API spawns the worker process; "external": run worker.py
+    if RETRAIN_WORKER == "embedded":
+        start_embedded_worker()
 
 
 # --- DB DEPENDENCY ---
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# get_db (sync) and get_async_db live in database.py with the pool statistics
 
 
-# --- TRAINING SERVICE (Background Task) ---
-def retrain_models_task():
-    print("🔄 ADMIN: Starting automated retraining...")
-    try:
-        db_engine = engine
-        transactions = pd.read_sql("SELECT * FROM transactions", db_engine)
-        products = pd.read_sql("SELECT * FROM products", db_engine)
-
-        if transactions.empty:
-            print("⚠️ ADMIN: Not enough data to train.")
-            return
-
-        # Simple training logic for the "Hot Swap"
-        df = transactions.merge(
-            products[["id", "category", "base_price"]],
-            left_on="product_id",
-            right_on="id",
-            how="left",
-        )
+def db_route(async_endpoint):
+    """
+    With DB_MODE=async, serves `async_endpoint` instead of the decorated
+    sync endpoint. The async versions await every query on the async engine
+    and hand pandas/sklearn work to the threadpool, so the event loop is
+    never blocked. With the default DB_MODE=sync nothing changes.
+    """
 
-        # Use timestamp if available, else date
-        date_col = "timestamp" if "timestamp" in df.columns else "date"
-        df["date"] = pd.to_datetime(df[date_col])
+    def choose(endpoint):
+        return async_endpoint if ASYNC_DB else endpoint
+
+    return choose
 
-        daily = (
-            df.groupby(["product_id", "date", "category", "base_price"])["quantity"]
-            .sum()
-            .reset_index()
-        )
-        daily = daily.sort_values(["product_id", "date"])
-
-        # Features
-        daily["day_of_week"] = daily["date"].dt.dayofweek
-        daily["month"] = daily["date"].dt.month
-        daily["lag_1"] = daily.groupby("product_id")["quantity"].shift(1)
-        daily["lag_7"] = daily.groupby("product_id")["quantity"].shift(7)
-        daily["rolling_mean_3"] = daily.groupby("product_id")["quantity"].transform(
-            lambda x: x.rolling(3).mean()
-        )
-        data = daily.dropna()
-
-        le = LabelEncoder()
-        data["category_encoded"] = le.fit_transform(data["category"].astype(str))
-
-        X = data[
-            [
-                "product_id",
-                "base_price",
-                "category_encoded",
-                "day_of_week",
-                "month",
-                "lag_1",
-                "lag_7",
-                "rolling_mean_3",
-            ]
-        ]
-        y = data["quantity"]
-
-        new_forecast_model = GradientBoostingRegressor(n_estimators=50, max_depth=3)
-        new_forecast_model.fit(X, y)
-
-        MODELS["forecast"] = new_forecast_model
-        MODELS["encoder"] = le
-        print("✅ ADMIN: AI Successfully Retrained & Hot-Swapped!")
 
+# --- REORDER REPORT SERVICE (Background Jobs) ---
+def refresh_reorder_task(product_ids=None):
+    """Recomputes the materialized reorder report (only `product_ids` if given)."""
+    db = SessionLocal()
+    try:
+        count = refresh_reorder_report(db, current_models(), product_ids)
+        if product_ids is None:
+            print(f"📋 Reorder report rebuilt ({count} products).")
     except Exception as e:
-        print(f"❌ ADMIN: Training Failed. Reason: {e}")
+        db.rollback()
+        print(f"❌ Reorder report refresh failed: {e}")
+    finally:
+        db.close()
 
 
 # --- ENDPOINTS ---
@@ -162,287 +236,479 @@ def health_check():
     return {"status": "online", "system": "OptiStock API"}
 
 
-@app.post("/admin/retrain")
-def trigger_retraining(background_tasks: BackgroundTasks):
-    background_tasks.add_task(retrain_models_task)
-    return {"message": "Training started in background."}
+@app.get("/admin/db-pool")
+def get_db_pool_stats():
+    """Connection pool health: checkouts, current usage and checkout wait times."""
+    return pool_stats()
 
 
-@app.get("/analytics/segment/{customer_id}", response_model=schemas.SegmentResponse)
-def get_customer_segment(customer_id: int, db: Session = Depends(get_db)):
-    # A. Fetch Transactions
-    query = db.query(Transaction).filter(Transaction.customer_id == customer_id).all()
+# --- SCRAPE-TIME GAUGES ---
+# Read when /metrics is scraped, so they cost nothing between scrapes.
 
-    if not query:
-        raise HTTPException(status_code=404, detail="Customer not found or no history")
 
-    # B. Calculate RFM
-    # Use 'timestamp' and 'total_price' from your DB model
-    data = [{"date": t.timestamp, "total_amount": t.total_price} for t in query]
+def collect_model_version(**_):
+    bundle = MODEL_REGISTRY.current()
+    return [] if bundle is None else [((bundle.version,), 1)]
 
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"])
 
-    now = datetime.now()
-    # If data is old, 'now' might make Recency huge. We should ideally use max(date) in DB.
-    # For now, we use the max date from the customer's history to avoid skewing.
-    last_active = df["date"].max()
-    recency = 0  # If they just bought
+def collect_model_age(**_):
+    bundle = MODEL_REGISTRY.current()
+    if bundle is None or not bundle.created_at:  # Legacy files carry no timestamp
+        return []
+    created = datetime.fromisoformat(bundle.created_at)
+    return [((), (datetime.now() - created).total_seconds())]
 
-    frequency = len(df)
-    monetary = df["total_amount"].sum()
 
-    raw_features = pd.DataFrame(
-        [[recency, frequency, monetary]], columns=["recency", "frequency", "monetary"]
+def collect_jobs(db: Session, **_):
+    rows = db.execute(
+        select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)
+    ).all()
+    return [((kind, status), count) for kind, status, count in rows]
+
+
+def collect_last_retrain(db: Session, **_):
+    job = db.execute(
+        select(Job)
+        .where(Job.kind == "retrain", Job.finished_at.is_not(None))
+        .order_by(desc(Job.finished_at))
+        .limit(1)
+    ).scalar()
+    if job is None or job.started_at is None:
+        return []
+    return [((job.status,), (job.finished_at - job.started_at).total_seconds())]
+
+
+def collect_running_retrain(db: Session, **_):
+    started = db.execute(
+        select(func.min(Job.started_at)).where(
+            Job.kind == "retrain", Job.status == "running"
+        )
+    ).scalar()
+    if started is None:
+        return [((), 0)]
+    return [((), (datetime.now() - started).total_seconds())]
+
+
+def collect_dashboard_cache_age(**_):
+    today = datetime.now().date()
+    keys = {
+        "today_revenue": ("today_revenue", today),
+        "revenue_trend": ("revenue_trend", today),
+        "top_products": ("top_products",),
+    }
+    return [((name,), DASHBOARD_CACHE.age(key)) for name, key in keys.items()]
+
+
+def collect_reorder_report_age(db: Session, **_):
+    oldest = db.execute(select(func.min(ReorderReport.computed_at))).scalar()
+    if oldest is None:
+        return []
+    return [((), (datetime.now() - oldest).total_seconds())]
+
+
+for gauge in [
+    Gauge(
+        "optistock_model_info",
+        "Model bundle version currently served (value is always 1).",
+        collect_model_version,
+        labels=("version",),
+    ),
+    Gauge(
+        "optistock_model_age_seconds",
+        "Seconds since the served model bundle was published.",
+        collect_model_age,
+    ),
+    Gauge(
+        "optistock_jobs",
+        "Background jobs by kind and status.",
+        collect_jobs,
+        labels=("kind", "status"),
+    ),
+    Gauge(
+        "optistock_retrain_last_duration_seconds",
+        "Wall time of the most recently finished retrain job.",
+        collect_last_retrain,
+        labels=("status",),
+    ),
+    Gauge(
+        "optistock_retrain_running_seconds",
+        "How long the current retrain job has been running (0 when idle).",
+        collect_running_retrain,
+    ),
+    Gauge(
+        "optistock_dashboard_cache_age_seconds",
+        "Age of each cached dashboard metric (absent when not cached).",
+        collect_dashboard_cache_age,
+        labels=("metric",),
+    ),
+    Gauge(
+        "optistock_reorder_report_age_seconds",
+        "Age of the oldest row of the materialized reorder report.",
+        collect_reorder_report_age,
+    ),
+]:
+    METRICS.register(gauge)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(db: Session = Depends(get_db)):
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(
+        METRICS.render(db=db), media_type="text/plain; version=0.0.4"
     )
 
-    scaled_features = MODELS["scaler"].transform(raw_features)
-    cluster_id = MODELS["kmeans"].predict(scaled_features)[0]
 
-    vip_id = MODELS["meta"]["vip_cluster"]
+@app.post("/admin/retrain")
+def trigger_retraining(db: Session = Depends(get_db)):
+    """
+    Queues a retrain for the worker process. While one is queued or running,
+    repeated calls return that same job instead of starting another.
+    """
+    job = enqueue(db, "retrain")
+    return {
+        "message": (
+            "Training queued." if job.status == "queued" else "Training in progress."
+        ),
+        "job_id": job.id,
+        "status": job.status,
+    }
+
+
+@app.get("/admin/jobs/{job_id}")
+def get_job_status(job_id: int, db: Session = Depends(get_db)):
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_to_dict(job)
+
+
+def segment_response(customer_id: int, rfm) -> dict:
+    if rfm is None:
+        raise HTTPException(status_code=404, detail="Customer not found or no history")
+
+    recency, frequency, monetary = rfm
+
+    # B. Scale and cluster straight from the array
+    models = current_models()
+    if "kmeans" not in models:
+        raise HTTPException(status_code=503, detail="AI Model is still loading.")
 
-    if cluster_id == vip_id:
-        segment_name = "VIP"
-    elif monetary < 50:
-        segment_name = "Budget"
-    else:
-        segment_name = "Regular"
+    cluster_id = predict_clusters(models, np.array([rfm], dtype=float))[0]
+    segment_name = label_segments(
+        np.array([cluster_id]), np.array([monetary]), models["meta"]["vip_cluster"]
+    )[0]
 
     return {
         "customer_id": customer_id,
-        "segment": segment_name,
+        "segment": str(segment_name),
         "recency": int(recency),
         "frequency": int(frequency),
         "monetary": float(monetary),
     }
 
 
+async def get_customer_segment_async(
+    customer_id: int, db: AsyncSession = Depends(get_async_db)
+):
+    row = (await db.execute(customer_rfm_query(customer_id))).one()
+    return await run_in_threadpool(segment_response, customer_id, rfm_from_row(row))
+
+
+@app.get("/analytics/segment/{customer_id}", response_model=schemas.SegmentResponse)
+@db_route(get_customer_segment_async)
+def get_customer_segment(customer_id: int, db: Session = Depends(get_db)):
+    # A. Calculate RFM inside the database (one aggregate query)
+    return segment_response(customer_id, customer_rfm(db, customer_id))
+
+
+@app.post("/admin/segments/rebuild")
+def rebuild_customer_segments(db: Session = Depends(get_db)):
+    """
+    Scores every customer in one pass and stores the result in customers.segment.
+    """
+    models = current_models()
+    if "kmeans" not in models:
+        raise HTTPException(status_code=503, detail="AI Model is still loading.")
+
+    counts = score_all_customers(db, models)
+    return {"message": "Customer segments updated.", "segments": counts}
+
+
+def segment_export_query(segment: Optional[str]):
+    query = select(Customer.id, Customer.name, Customer.email, Customer.segment)
+    if segment:
+        query = query.where(Customer.segment == segment)
+    return query.order_by(Customer.id)
+
+
+def segment_export_rows(rows) -> list:
+    return [
+        {"customer_id": c.id, "name": c.name, "email": c.email, "segment": c.segment}
+        for c in rows
+    ]
+
+
+async def export_customer_segments_async(
+    segment: Optional[str] = None, db: AsyncSession = Depends(get_async_db)
+):
+    rows = (await db.execute(segment_export_query(segment))).all()
+    return segment_export_rows(rows)
+
+
+@app.get("/analytics/segments")
+@db_route(export_customer_segments_async)
+def export_customer_segments(
+    segment: Optional[str] = None, db: Session = Depends(get_db)
+):
+    """
+    Marketing export: every customer with their stored segment
+    (run /admin/segments/rebuild first to refresh them).
+    """
+    return segment_export_rows(db.execute(segment_export_query(segment)).all())
+
+
+def forecast_models() -> dict:
+    models = current_models()
+    if models.get("forecast") is None:
+        raise HTTPException(status_code=503, detail="AI Model is still loading.")
+    return models
+
+
+def single_prediction(result: dict) -> dict:
+    if result["not_found"]:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return result["predictions"][0]
+
+
+async def predict_batch_async(db: AsyncSession, models: dict, items) -> dict:
+    """predict_batch with awaited queries and the scoring in the threadpool."""
+    product_ids = requested_ids(items)
+    products = products_frame((await db.execute(products_query(product_ids))).all())
+    recent = history_frame((await db.execute(recent_history_query(product_ids))).all())
+    return await run_in_threadpool(score_requests, models, items, products, recent)
+
+
+async def predict_demand_async(
+    req: schemas.ForecastRequest, db: AsyncSession = Depends(get_async_db)
+):
+    models = forecast_models()
+    return single_prediction(await predict_batch_async(db, models, [req]))
+
+
 @app.post("/forecast/predict")
+@db_route(predict_demand_async)
 def predict_demand(req: schemas.ForecastRequest, db: Session = Depends(get_db)):
     """
     Predicts sales for 'Tomorrow' using REAL historical data (Time-Travel Logic).
+    The product's last sales day acts as "Yesterday"; lags come from the
+    daily sales rollup.
     """
-    if "forecast" not in MODELS or MODELS["forecast"] is None:
-        raise HTTPException(status_code=503, detail="AI Model is still loading.")
+    models = forecast_models()
+    return single_prediction(predict_batch(db, models, [req]))
 
-    # 1. Get Product
-    product = db.query(Product).filter(Product.id == req.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
 
-    # 2. Get Last Active Date (Time Travel)
-    # We find the last time this product was sold to act as "Yesterday"
-    last_sale = (
-        db.query(Transaction.timestamp)
-        .filter(Transaction.product_id == req.product_id)
-        .order_by(desc(Transaction.timestamp))
-        .first()
-    )
+async def predict_demand_batch_async(
+    req: schemas.BatchForecastRequest, db: AsyncSession = Depends(get_async_db)
+):
+    models = forecast_models()
+    if not req.items:
+        return {"predictions": [], "not_found": []}
+    return await predict_batch_async(db, models, req.items)
 
-    if not last_sale:
-        return {
-            "product_id": req.product_id,
-            "predicted_sales": 0,
-            "confidence_score": 0.0,
-        }
 
-    reference_date = last_sale[0]
+@app.post("/forecast/predict-batch", response_model=schemas.BatchForecastResponse)
+@db_route(predict_demand_batch_async)
+def predict_demand_batch(
+    req: schemas.BatchForecastRequest, db: Session = Depends(get_db)
+):
+    """
+    Same prediction as /forecast/predict for many products at once.
+    All histories come from one grouped query and the model is called once.
+    """
+    models = forecast_models()
+    if not req.items:
+        return {"predictions": [], "not_found": []}
 
-    # 3. Fetch History inputs
-    history = (
-        db.query(Transaction)
-        .filter(Transaction.product_id == req.product_id)
-        .filter(Transaction.timestamp <= reference_date)
-        .order_by(desc(Transaction.timestamp))
-        .limit(7)
-        .all()
-    )
+    return predict_batch(db, models, req.items)
 
-    if not history:
-        return {
-            "product_id": req.product_id,
-            "predicted_sales": 0,
-            "confidence_score": 0.0,
-        }
 
-    # 4. Feature Calc
-    data = [{"qty": t.quantity, "date": t.timestamp} for t in history]
-    df = pd.DataFrame(data).sort_values("date")
-    qty_series = df["qty"]
-
-    features = {
-        "product_id": req.product_id,
-        "base_price": req.price_override if req.price_override else product.base_price,
-        "category_encoded": 0,
-        "day_of_week": reference_date.weekday(),
-        "month": reference_date.month,
-        "lag_1": qty_series.iloc[-1] if len(qty_series) >= 1 else 0,
-        "lag_7": qty_series.iloc[-7] if len(qty_series) >= 7 else qty_series.mean(),
-        "rolling_mean_3": qty_series.tail(3).mean() if len(qty_series) > 0 else 0,
-    }
+def selected_fields(fields: Optional[str]) -> list:
+    selected = fields.split(",") if fields else list(PRODUCT_FIELDS)
+    unknown = [f for f in selected if f not in PRODUCT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {unknown}")
+    return selected
 
-    try:
-        features["category_encoded"] = MODELS["encoder"].transform([product.category])[
-            0
-        ]
-    except:
-        features["category_encoded"] = 0
 
-    input_vector = pd.DataFrame([features])
+def catalog_page_headers(response: Response, etag: str, products: list, limit):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"  # Always revalidate
+    if limit is not None and len(products) == limit:
+        response.headers["X-Next-After-Id"] = str(products[-1]["id"])
 
-    try:
-        prediction = MODELS["forecast"].predict(input_vector)[0]
-        final_prediction = int(max(0, round(prediction)))
-    except Exception as e:
-        print(f"Prediction Error: {e}")
-        final_prediction = 0
 
-    return {
-        "product_id": req.product_id,
-        "predicted_sales": final_prediction,
-        "confidence_score": 0.85,
-        "product_name": product.name,
-    }
+async def get_products_async(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    category: Optional[list[str]] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+):
+    selected = selected_fields(fields)
+
+    version = (await db.execute(catalog_version_query())).scalar() or 0
+    etag = catalog_etag(version, str(request.query_params))
+    if etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    query = products_page_query(selected, category, after_id, limit)
+    products = [dict(row._mapping) for row in await db.execute(query)]
+    catalog_page_headers(response, etag, products, limit)
+    return products
 
 
 @app.get("/products")
-def get_products(db: Session = Depends(get_db)):
-    return db.query(Product).all()
+@db_route(get_products_async)
+def get_products(
+    request: Request,
+    response: Response,
+    after_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    category: Optional[list[str]] = Query(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Product catalog.
+    Without parameters it returns everything (old POS behaviour). Optional:
+      after_id / limit  -> keyset pagination (next cursor in X-Next-After-Id)
+      fields=id,name    -> only these columns
+      category=Home     -> filter (repeatable)
+    Responses carry an ETag; send it back in If-None-Match to get a 304
+    while the catalog is unchanged.
+    """
+    selected = selected_fields(fields)
+
+    etag = catalog_etag(current_catalog_version(db), str(request.query_params))
+    if etag_matches(etag, request.headers.get("if-none-match", "")):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    products = list_products(db, selected, category, after_id, limit)
+    catalog_page_headers(response, etag, products, limit)
+    return products
 
 
 @app.put("/products/{product_id}/stock")
-def update_stock(product_id: int, update: StockUpdate, db: Session = Depends(get_db)):
+def update_stock(
+    product_id: int,
+    update: StockUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
     product.stock = update.quantity
+    bump_catalog_version(db)
     db.commit()
+    background_tasks.add_task(refresh_reorder_task, [product_id])
     return {"message": "Stock updated", "new_stock": product.stock}
 
 
+def report_headers(response: Response, report: list):
+    if report:
+        oldest = min(r["computed_at"] for r in report)
+        response.headers["X-Report-Computed-At"] = oldest.isoformat()
+
+
+async def get_reorder_report_async(
+    response: Response, db: AsyncSession = Depends(get_async_db)
+):
+    if (await db.execute(any_report_row_query())).first() is None:
+        # First request after a deploy: inference runs on the sync engine
+        await run_in_threadpool(refresh_reorder_task)
+
+    report = report_rows((await db.execute(reorder_report_query())).scalars())
+    report_headers(response, report)
+    return report
+
+
 @app.get("/analytics/reorder-report", response_model=list[RestockRecommendation])
-def get_reorder_report(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
-    report = []
+@db_route(get_reorder_report_async)
+def get_reorder_report(response: Response, db: Session = Depends(get_db)):
+    # Reads the pre-calculated report; inference runs in the background jobs.
+    if reorder_report_is_empty(db):
+        refresh_reorder_report(db, current_models())  # First request after a deploy
+
+    report = read_reorder_report(db)
+    report_headers(response, report)
+    return report
 
-    # Note: For performance on large datasets, we use simplified logic here.
-    # In a real production app, we would pre-calculate this in a background job.
-    for p in products:
-        try:
-            cat_encoded = MODELS["encoder"].transform([p.category])[0]
-        except:
-            cat_encoded = 0
-
-        # Simplified inputs for bulk reporting to avoid DB slam
-        features = pd.DataFrame(
-            [[p.id, p.base_price, cat_encoded, 0, 11, 5.0, 5.0, 5.0]],
-            columns=[
-                "product_id",
-                "base_price",
-                "category_encoded",
-                "day_of_week",
-                "month",
-                "lag_1",
-                "lag_7",
-                "rolling_mean_3",
-            ],
-        )
 
-        try:
-            predicted = int(max(0, round(MODELS["forecast"].predict(features)[0])))
-        except:
-            predicted = 0
+# --- DASHBOARD METRICS (cached per metric) ---
+# Query builders live in dashboard.py (EXPLAINed by migrations.py too).
 
-        safety_buffer = 5
-        required_stock = predicted + safety_buffer
 
-        status = "OK"
-        order_amount = 0
+async def get_dashboard_stats_async(db: AsyncSession = Depends(get_async_db)):
+    today = datetime.now().date()
 
-        if p.stock < predicted:
-            status = "CRITICAL"
-            order_amount = required_stock - p.stock
-        elif p.stock < required_stock:
-            status = "LOW"
-            order_amount = required_stock - p.stock
+    async def today_revenue():
+        return (await db.execute(today_revenue_query(today))).scalar() or 0.0
 
-        if status != "OK":
-            report.append(
-                {
-                    "product_id": p.id,
-                    "name": p.name or "Unknown Product",  # Safe fallback
-                    "current_stock": p.stock,
-                    "predicted_demand": predicted,
-                    "status": status,
-                    "recommended_order": order_amount,
-                }
-            )
+    async def revenue_trend():
+        return revenue_trend_rows(await db.execute(revenue_trend_query(today)))
 
-    return report
+    async def top_products():
+        return top_products_rows(await db.execute(top_products_query()))
+
+    return {
+        "today_revenue": await DASHBOARD_CACHE.get_or_compute_async(
+            ("today_revenue", today), today_revenue
+        ),
+        "revenue_trend": await DASHBOARD_CACHE.get_or_compute_async(
+            ("revenue_trend", today), revenue_trend
+        ),
+        "top_products": await DASHBOARD_CACHE.get_or_compute_async(
+            ("top_products",), top_products
+        ),
+    }
 
 
 @app.get("/analytics/dashboard")
+@db_route(get_dashboard_stats_async)
 def get_dashboard_stats(db: Session = Depends(get_db)):
     """
     Returns Executive Metrics:
     1. Total Revenue Today
     2. Revenue Last 7 Days (Trend)
     3. Top 5 Selling Products
+    Each metric is cached for DASHBOARD_CACHE_SECONDS; checkouts invalidate them.
     """
     today = datetime.now().date()
-    seven_days_ago = today - timedelta(days=7)
-
-    # A. Total Revenue Today
-    # We sum the 'total_price' of all transactions from today
-    # Note: Ensure your Transaction model has a 'total_price' column.
-    # If not, calculate it (quantity * price).
-    todays_sales = (
-        db.query(func.sum(Transaction.total_price))
-        .filter(func.date(Transaction.timestamp) == today)
-        .scalar()
-        or 0.0
-    )
-
-    # B. Revenue Trend (Last 7 Days)
-    # This creates the data for the Line Chart
-    trend_data = (
-        db.query(
-            func.date(Transaction.timestamp).label("date"),
-            func.sum(Transaction.total_price).label("revenue"),
-        )
-        .filter(Transaction.timestamp >= seven_days_ago)
-        .group_by(func.date(Transaction.timestamp))
-        .all()
-    )
-
-    # Format for Frontend: [{"date": "2023-10-01", "revenue": 1200}, ...]
-    chart_data = [{"date": str(t.date), "revenue": t.revenue} for t in trend_data]
-
-    # C. Top 5 Products
-    # This creates the data for the Bar Chart
-    top_products_query = (
-        db.query(Product.name, func.sum(Transaction.quantity).label("sold"))
-        .join(Transaction, Product.id == Transaction.product_id)
-        .group_by(Product.name)
-        .order_by(desc("sold"))
-        .limit(5)
-        .all()
-    )
-
-    top_products = [{"name": p.name, "sold": p.sold} for p in top_products_query]
 
     return {
-        "today_revenue": todays_sales,
-        "revenue_trend": chart_data,
-        "top_products": top_products,
+        "today_revenue": DASHBOARD_CACHE.get_or_compute(
+            ("today_revenue", today),
+            lambda: db.execute(today_revenue_query(today)).scalar() or 0.0,
+        ),
+        "revenue_trend": DASHBOARD_CACHE.get_or_compute(
+            ("revenue_trend", today),
+            lambda: revenue_trend_rows(db.execute(revenue_trend_query(today))),
+        ),
+        "top_products": DASHBOARD_CACHE.get_or_compute(
+            ("top_products",),
+            lambda: top_products_rows(db.execute(top_products_query())),
+        ),
     }
 
 
 # --- ADD THIS NEW SCHEMA ---
 class CartItem(BaseModel):
     product_id: int
-    quantity: int
+    quantity: int = Field(gt=0)  # A sale can never add stock back
     price: float
 
 
@@ -450,36 +716,167 @@ class CheckoutRequest(BaseModel):
     items: list[CartItem]
 
 
+def cart_demand(items) -> dict:
+    # Merge repeated lines so each product is decremented once
+    demand = {}
+    for item in items:
+        demand[item.product_id] = demand.get(item.product_id, 0) + item.quantity
+    return demand
+
+
+def stock_decrement(demand: dict):
+    # stock = stock - :q is evaluated inside the DB, so two terminals
+    # selling the same SKU can't overwrite each other's decrement.
+    sold = case(demand, value=Product.id)
+    return (
+        update(Product)
+        .where(Product.id.in_(list(demand)))
+        .where(Product.stock >= sold)
+        .values(stock=Product.stock - sold)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def transaction_rows(items, now: datetime) -> list:
+    return [
+        {
+            "product_id": item.product_id,
+            "customer_id": 1,  # Default "Walk-in Customer" ID
+            "quantity": item.quantity,
+            "total_price": item.price * item.quantity,  # Store total value
+            "timestamp": now,
+        }
+        for item in items
+    ]
+
+
+def sold_items(items) -> list:
+    return [(i.product_id, i.quantity, i.price * i.quantity) for i in items]
+
+
+def stock_levels_query(demand: dict):
+    return select(Product.id, Product.stock).where(Product.id.in_(list(demand)))
+
+
+def stock_shortfalls(demand: dict, stock: dict) -> list:
+    """
+    Explains a rejected checkout: one entry per product that is unknown or
+    does not have enough stock left. Only runs on the failure path.
+    """
+    problems = []
+    for product_id, requested in demand.items():
+        if product_id not in stock:
+            problems.append(
+                {
+                    "product_id": product_id,
+                    "requested": requested,
+                    "available": 0,
+                    "reason": "Product not found",
+                }
+            )
+        elif (stock[product_id] or 0) < requested:
+            problems.append(
+                {
+                    "product_id": product_id,
+                    "requested": requested,
+                    "available": stock[product_id] or 0,
+                    "reason": "Insufficient stock",
+                }
+            )
+    return problems
+
+
+def find_stock_shortfalls(db: Session, demand: dict) -> list:
+    return stock_shortfalls(demand, dict(db.execute(stock_levels_query(demand)).all()))
+
+
+def stock_rejection(problems: list) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail={"message": "Checkout rejected: not enough stock", "items": problems},
+    )
+
+
+async def process_checkout_async(
+    checkout: CheckoutRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+):
+    if not checkout.items:
+        return {"message": "Sale recorded successfully"}
+
+    now = datetime.now()
+    demand = cart_demand(checkout.items)
+
+    try:
+        result = await db.execute(stock_decrement(demand))
+        if result.rowcount != len(demand):
+            await db.rollback()
+            stock = dict((await db.execute(stock_levels_query(demand))).all())
+            raise stock_rejection(stock_shortfalls(demand, stock))
+
+        await db.execute(insert(Transaction), transaction_rows(checkout.items, now))
+        await db.execute(
+            sales_upsert(db.bind.dialect.name),
+            sales_rows(now.date(), sold_items(checkout.items)),
+        )
+        await db.execute(catalog_version_bump())
+
+        await db.commit()
+        DASHBOARD_CACHE.invalidate()
+        background_tasks.add_task(refresh_reorder_task, list(demand))
+        return {"message": "Sale recorded successfully"}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # --- ADD THIS NEW ENDPOINT ---
 @app.post("/pos/checkout")
-def process_checkout(checkout: CheckoutRequest, db: Session = Depends(get_db)):
+@db_route(process_checkout_async)
+def process_checkout(
+    checkout: CheckoutRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
     """
-    1. Saves each item as a Transaction (History).
-    2. Updates Inventory (Stock).
+    1. Updates Inventory (Stock) with ONE conditional UPDATE for the whole cart.
+    2. Saves every item as a Transaction (History) with ONE bulk INSERT.
+    Both happen in the same DB transaction; if any item would oversell,
+    nothing is written and every short item is reported (HTTP 409).
     """
+    if not checkout.items:
+        return {"message": "Sale recorded successfully"}
+
+    # Create a timestamp for this entire batch
+    now = datetime.now()
+    demand = cart_demand(checkout.items)
+
     try:
-        # Create a timestamp for this entire batch
-        now = datetime.now()
-
-        for item in checkout.items:
-            # A. Record the Sale (History)
-            new_transaction = Transaction(
-                product_id=item.product_id,
-                customer_id=1,  # Default "Walk-in Customer" ID
-                quantity=item.quantity,
-                total_price=item.price * item.quantity,  # Store total value
-                timestamp=now,
-            )
-            db.add(new_transaction)
+        # A. Update Stock (Inventory)
+        result = db.execute(stock_decrement(demand))
+
+        if result.rowcount != len(demand):
+            db.rollback()
+            raise stock_rejection(find_stock_shortfalls(db, demand))
+
+        # B. Record the Sale (History)
+        db.execute(insert(Transaction), transaction_rows(checkout.items, now))
 
-            # B. Update Stock (Inventory)
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            if product:
-                product.stock -= item.quantity
+        # C. Keep the daily rollup in step (same DB transaction)
+        record_sales(db, now.date(), sold_items(checkout.items))
+        bump_catalog_version(db)  # Stock changed: cached catalogs are stale
 
         db.commit()
+        DASHBOARD_CACHE.invalidate()  # Revenue and top sellers just changed
+        background_tasks.add_task(refresh_reorder_task, list(demand))
         return {"message": "Sale recorded successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
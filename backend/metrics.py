@@ -0,0 +1,204 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Latency buckets in seconds (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus-style histogram with fixed buckets, one series
+    per label combination. Observations cost one bisect and a lock.
+    """
+
+    def __init__(self, name: str, help_text: str, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, **context) -> list:
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-2]:.6f}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """
+    Value computed at scrape time: `collect(**context)` returns
+    [(label values, value)]; None values are left out.
+    """
+
+    def __init__(self, name: str, help_text: str, collect, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.collect = collect
+
+    def render(self, **context) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        try:
+            samples = self.collect(**context)
+        except Exception as e:  # One broken collector must not break the scrape
+            return lines + [f"# {self.name} unavailable: {type(e).__name__}"]
+        for label_values, value in samples:
+            if value is None:
+                continue
+            labels = _format_labels(self.labels, tuple(label_values))
+            lines.append(f"{self.name}{labels} {float(value):.6g}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, **context) -> str:
+        """Prometheus text exposition; `context` is passed to gauge collectors."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(**context))
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+REQUEST_SECONDS = METRICS.register(
+    Histogram(
+        "optistock_http_request_duration_seconds",
+        "HTTP request latency by route template, method and status code.",
+        labels=("method", "route", "status"),
+    )
+)
+REQUEST_DB_QUERIES = METRICS.register(
+    Histogram(
+        "optistock_http_request_db_queries",
+        "SQL statements executed per HTTP request.",
+        labels=("route",),
+        buckets=COUNT_BUCKETS,
+    )
+)
+REQUEST_DB_SECONDS = METRICS.register(
+    Histogram(
+        "optistock_http_request_db_seconds",
+        "Time per HTTP request spent waiting on SQL statements.",
+        labels=("route",),
+    )
+)
+DB_QUERY_SECONDS = METRICS.register(
+    Histogram(
+        "optistock_db_query_duration_seconds",
+        "Duration of single SQL statements, by statement type.",
+        labels=("operation",),
+    )
+)
+STAGE_SECONDS = METRICS.register(
+    Histogram(
+        "optistock_stage_duration_seconds",
+        "Time spent in named in-process stages (pandas features, model inference).",
+        labels=("stage",),
+    )
+)
+
+
+# --- PER-REQUEST DB ACCOUNTING ---
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Set by the middleware; endpoint threads run in a copy of the request
+# context, so they see (and update) the same RequestStats object.
+_current_request = contextvars.ContextVar("optistock_request_stats", default=None)
+
+
+def begin_request() -> RequestStats:
+    stats = RequestStats()
+    _current_request.set(stats)
+    return stats
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_started"].pop()
+    seconds = time.perf_counter() - started
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement else "?"
+    DB_QUERY_SECONDS.observe(seconds, operation)
+
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+
+def instrument_queries(db_engine):
+    """Times every statement run on `db_engine` (a sync Engine)."""
+    event.listen(db_engine, "before_cursor_execute", _before_execute)
+    event.listen(db_engine, "after_cursor_execute", _after_execute)
+
+
+@contextmanager
+def timed(stage: str):
+    """Records the wall time of the block under optistock_stage_duration_seconds."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
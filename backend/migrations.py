@@ -0,0 +1,312 @@
+import argparse
+import sys
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from dashboard import today_revenue_query, revenue_trend_query, top_products_query
+from database import engine, Base
+from forecasting import recent_history_query, reorder_report_query
+from rollups import backfill_statement
+from segmentation import customer_rfm_query
+
+# --- 1. MIGRATIONS (append only, never edit an applied one) ---
+# DDL is spelled out (not Model.__table__ or create_all) so later model
+# edits can't change what an old migration does.
+
+
+def _id_column(conn) -> str:
+    return "SERIAL" if conn.dialect.name == "postgresql" else "INTEGER"
+
+
+def _create_base_tables(conn):
+    id_column = _id_column(conn)
+    conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS products (
+                id {id_column} PRIMARY KEY,
+                name VARCHAR,
+                category VARCHAR,
+                base_price FLOAT,
+                stock INTEGER
+            )
+            """))
+    conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS customers (
+                id {id_column} PRIMARY KEY,
+                name VARCHAR,
+                email VARCHAR,
+                segment VARCHAR
+            )
+            """))
+    conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id {id_column} PRIMARY KEY,
+                customer_id INTEGER REFERENCES customers (id),
+                product_id INTEGER REFERENCES products (id),
+                quantity INTEGER,
+                timestamp TIMESTAMP,
+                total_price FLOAT
+            )
+            """))
+    for index, table, column in [
+        ("ix_products_id", "products", "id"),
+        ("ix_products_name", "products", "name"),
+        ("ix_customers_id", "customers", "id"),
+        ("ix_transactions_id", "transactions", "id"),
+    ]:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})"))
+
+
+def _seed_catalog_version(conn):
+    conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER PRIMARY KEY,
+                version INTEGER NOT NULL
+            )
+            """))
+    if conn.execute(text("SELECT 1 FROM catalog_version WHERE id = 1")).first() is None:
+        conn.execute(text("INSERT INTO catalog_version (id, version) VALUES (1, 1)"))
+
+
+def _create_jobs_table(conn):
+    conn.execute(text(f"""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id {_id_column(conn)} PRIMARY KEY,
+                kind VARCHAR NOT NULL,
+                status VARCHAR,
+                progress FLOAT,
+                message VARCHAR,
+                active_key VARCHAR UNIQUE,
+                created_at TIMESTAMP,
+                started_at TIMESTAMP,
+                heartbeat_at TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+            """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_id ON jobs (id)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs (status)"))
+
+
+def _create_daily_sales_rollup(conn):
+    conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS daily_product_sales (
+                product_id INTEGER NOT NULL REFERENCES products (id),
+                day DATE NOT NULL,
+                quantity INTEGER,
+                revenue FLOAT,
+                PRIMARY KEY (product_id, day)
+            )
+            """))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_daily_product_sales_day "
+            "ON daily_product_sales (day)"
+        )
+    )
+    # Databases from before the rollup: build it once from their history
+    if conn.execute(text("SELECT 1 FROM daily_product_sales LIMIT 1")).first() is None:
+        print("📊 Building daily sales rollup from transactions...")
+        conn.execute(backfill_statement())
+
+
+def _create_reorder_report(conn):
+    conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS reorder_report (
+                product_id INTEGER PRIMARY KEY REFERENCES products (id),
+                name VARCHAR,
+                current_stock INTEGER,
+                predicted_demand INTEGER,
+                status VARCHAR,
+                recommended_order INTEGER,
+                computed_at TIMESTAMP
+            )
+            """))
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_reorder_report_status "
+            "ON reorder_report (status)"
+        )
+    )
+
+
+MIGRATIONS = [
+    (1, "Products, customers and transactions", _create_base_tables),
+    (
+        2,
+        "Composite indexes for the hot transaction queries",
+        [
+            "CREATE INDEX IF NOT EXISTS ix_transactions_product_timestamp "
+            "ON transactions (product_id, timestamp)",
+            "CREATE INDEX IF NOT EXISTS ix_transactions_customer_timestamp "
+            "ON transactions (customer_id, timestamp)",
+            "CREATE INDEX IF NOT EXISTS ix_transactions_timestamp "
+            "ON transactions (timestamp)",
+        ],
+    ),
+    (3, "Catalog version counter for /products ETags", _seed_catalog_version),
+    (4, "Persistent job queue for the retrain worker", _create_jobs_table),
+    (5, "Daily sales rollup", _create_daily_sales_rollup),
+    (6, "Materialized reorder report", _create_reorder_report),
+]
+
+# Postgres advisory lock key held while migrating
+MIGRATION_LOCK_ID = 7051787
+
+
+def applied_versions(conn) -> set:
+    conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description VARCHAR,
+                applied_at TIMESTAMP
+            )
+            """))
+    return {
+        row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))
+    }
+
+
+def upgrade(db_engine: Engine = engine) -> list:
+    """
+    Applies every pending migration in order, each in its own transaction,
+    and records it in schema_migrations. Works in place on both SQLite and
+    Postgres databases.
+    Run it ONCE per deploy, before the API starts (`python migrations.py`,
+    see render.yaml), not from every API worker. On Postgres a session
+    advisory lock also makes instances that start together take turns.
+    """
+    with db_engine.connect() as lock_conn:
+        locking = lock_conn.dialect.name == "postgresql"
+        if locking:
+            lock_conn.execute(
+                text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID}
+            )
+            lock_conn.commit()
+        try:
+            return _apply_pending(db_engine)
+        finally:
+            if locking:
+                lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID}
+                )
+                lock_conn.commit()
+
+
+def _apply_pending(db_engine: Engine) -> list:
+    with db_engine.begin() as conn:
+        # Read after taking the lock: another instance may have just migrated
+        done = applied_versions(conn)
+    applied = []
+
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
+
+        print(f"🛠️  Migration {version}: {description}...")
+        with db_engine.begin() as conn:
+            if callable(step):
+                step(conn)
+            else:
+                for statement in step:
+                    conn.execute(text(statement))
+            conn.execute(
+                text(
+                    "INSERT INTO schema_migrations (version, description, applied_at) "
+                    "VALUES (:version, :description, :applied_at)"
+                ),
+                {
+                    "version": version,
+                    "description": description,
+                    "applied_at": datetime.now(),
+                },
+            )
+        applied.append(version)
+
+    return applied
+
+
+# --- 2. QUERY PLAN CHECKS (catch full-table-scan regressions) ---
+
+
+def hot_queries() -> dict:
+    """
+    {name: statement} built by the same functions the API calls per request,
+    with dates relative to now (computed at check time, not import time).
+    """
+    today = datetime.now().date()
+    return {
+        "segment: RFM for one customer": customer_rfm_query(1),
+        "forecast: recent rollup history of requested products": (
+            recent_history_query([1, 2])
+        ),
+        "reorder: flagged rows of the materialized report": reorder_report_query(),
+        "dashboard: revenue today": today_revenue_query(today),
+        "dashboard: revenue trend": revenue_trend_query(today),
+        "dashboard: top products": top_products_query(),
+    }
+
+
+def _explainable_sql(conn, statement) -> str:
+    # Literal values: EXPLAIN can't take the driver's bound parameters
+    return str(
+        statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    )
+
+
+def _full_scans(conn, statement) -> list:
+    """Returns the plan lines that read a whole table without an index."""
+    sql = _explainable_sql(conn, statement)
+    if conn.dialect.name == "sqlite":
+        plan = [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+        tables = set(Base.metadata.tables)
+        return [
+            line
+            for line in plan
+            if line.split(" ")[0] in ("SCAN", "SEARCH")
+            and line.replace("TABLE ", "").split(" ")[1] in tables
+            and "USING" not in line
+        ]
+
+    # Postgres prefers seq scans on tiny tables; ask whether an index is usable
+    conn.execute(text("SET LOCAL enable_seqscan = off"))
+    plan = [row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}")]
+    return [line.strip() for line in plan if "Seq Scan" in line]
+
+
+def check_query_plans(db_engine: Engine = engine) -> dict:
+    """
+    EXPLAINs every hot query and returns {name: [full-scan plan lines]}.
+    An empty list means the query is served by an index.
+    """
+    results = {}
+    with db_engine.connect() as conn:
+        for name, statement in hot_queries().items():
+            with conn.begin():
+                results[name] = _full_scans(conn, statement)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Upgrade the OptiStock schema in place."
+    )
+    parser.add_argument(
+        "--check-plans",
+        action="store_true",
+        help="After upgrading, fail if a hot query needs a full table scan.",
+    )
+    args = parser.parse_args()
+
+    applied = upgrade()
+    print(f"✅ Schema up to date ({len(applied)} migration(s) applied).")
+
+    if args.check_plans:
+        failures = 0
+        for name, scans in check_query_plans().items():
+            if scans:
+                failures += 1
+                print(f"❌ {name}: full scan -> {'; '.join(scans)}")
+            else:
+                print(f"✅ {name}: uses an index")
+        sys.exit(1 if failures else 0)
@@ -0,0 +1,199 @@
+import os
+import pickle
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Optional
+
+# --- CONFIGURATION ---
+ML_ENGINE_DIR = os.getenv(
+    "MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml-engine"),
+)
+REGISTRY_DIR = os.path.join(ML_ENGINE_DIR, "registry")
+CURRENT_FILE = os.path.join(REGISTRY_DIR, "CURRENT")  # The version stamp
+CHECK_SECONDS = float(os.getenv("MODEL_CHECK_SECONDS", "5"))
+KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "5"))  # Older bundles are pruned
+
+# Artifacts written by ml-engine/train_*.py (the bundle before any retrain)
+LEGACY_FILES = {
+    "kmeans": "kmeans_model.pkl",
+    "scaler": "scaler.pkl",
+    "meta": "model_metadata.pkl",
+    "forecast": "forecast_model.pkl",
+    "encoder": "category_encoder.pkl",
+}
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """
+    Every model the API serves, from one version. Immutable: a new version
+    is a new bundle, swapped in with a single reference assignment, so a
+    request can never pair a new forecast model with an old encoder.
+    """
+
+    version: str
+    models: MappingProxyType = field(repr=False)
+    created_at: str = ""
+
+
+def _write_atomically(path: str, data: bytes):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)  # Readers see the old file or the new one
+
+
+class ModelRegistry:
+    """
+    Versioned model bundles on disk:
+        registry/<version>.pkl  one pickle holding all models of a version
+        registry/CURRENT        name of the version workers should serve
+    Each worker re-reads the tiny CURRENT stamp at most every CHECK_SECONDS
+    and loads a bundle only when the stamp changed, so every uvicorn /
+    gunicorn worker converges on the same models after a retrain.
+    """
+
+    def __init__(self, root: str = REGISTRY_DIR):
+        self.root = root
+        self.current_file = os.path.join(root, "CURRENT")
+        self._bundle: Optional[ModelBundle] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    # --- READ SIDE ---
+
+    def current(self) -> Optional[ModelBundle]:
+        if time.monotonic() - self._checked_at >= CHECK_SECONDS:
+            self.refresh()
+        return self._bundle
+
+    def refresh(self) -> Optional[ModelBundle]:
+        """Loads the published version if it differs from the one in memory."""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                self._swap(self._load_published())
+            except Exception as e:
+                # Keep serving whatever is loaded; retry on the next check
+                print(f" -> ERROR: Could not load models. Check paths! {e}")
+
+            return self._bundle
+
+    def _load_published(self) -> ModelBundle:
+        """The bundle CURRENT points at (or the legacy files); caller holds the lock."""
+        if self._serves_legacy():
+            return self._load_legacy()
+        stamp = self._read_stamp()
+        if self._bundle is not None and self._bundle.version == stamp:
+            return self._bundle
+        return self._load_version(stamp)
+
+    def _swap(self, bundle: Optional[ModelBundle]):
+        if bundle is not None and bundle is not self._bundle:
+            self._bundle = bundle
+            print(f" -> Serving model version {bundle.version}")
+
+    def _read_stamp(self) -> Optional[str]:
+        try:
+            with open(self.current_file) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _serves_legacy(self) -> bool:
+        return self._read_stamp() is None or self._legacy_is_newer()
+
+    def _legacy_is_newer(self) -> bool:
+        # A fresh `python train_forecasting.py` run beats an older retrain
+        legacy = os.path.join(ML_ENGINE_DIR, LEGACY_FILES["forecast"])
+        try:
+            return os.path.getmtime(legacy) > os.path.getmtime(self.current_file)
+        except FileNotFoundError:
+            return False
+
+    def _load_version(self, version: str) -> ModelBundle:
+        with open(os.path.join(self.root, f"{version}.pkl"), "rb") as f:
+            payload = pickle.load(f)
+        return ModelBundle(
+            version=version,
+            models=MappingProxyType(payload["models"]),
+            created_at=payload.get("created_at", ""),
+        )
+
+    def _load_legacy(self) -> ModelBundle:
+        if self._bundle is not None and self._bundle.version == "legacy":
+            return self._bundle
+
+        models = {}
+        for name, filename in LEGACY_FILES.items():
+            with open(os.path.join(ML_ENGINE_DIR, filename), "rb") as f:
+                models[name] = pickle.load(f)
+        return ModelBundle(version="legacy", models=MappingProxyType(models))
+
+    # --- WRITE SIDE ---
+
+    def publish(self, models: dict) -> ModelBundle:
+        """
+        Writes a complete bundle atomically, then points CURRENT at it.
+        Missing models are carried over from the PUBLISHED bundle, re-read
+        from disk: the publishing process (e.g. the retrain worker) may not
+        have loaded any models itself.
+        """
+        with self._lock:
+            try:
+                published = self._load_published()
+            except FileNotFoundError:
+                published = None  # Nothing trained yet: this is the first bundle
+            except Exception as e:
+                if not self._serves_legacy():
+                    raise  # A broken registry version must not be dropped silently
+                # e.g. legacy pickles from another scikit-learn: this replaces them
+                print(f" -> WARNING: Ignoring unloadable legacy models. {e}")
+                published = None
+            base = dict(published.models) if published is not None else {}
+            base.update(models)
+
+            created_at = datetime.now()
+            version = f"{created_at:%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+            payload = {"models": base, "created_at": created_at.isoformat()}
+
+            os.makedirs(self.root, exist_ok=True)
+            _write_atomically(
+                os.path.join(self.root, f"{version}.pkl"), pickle.dumps(payload)
+            )
+            _write_atomically(self.current_file, version.encode())
+
+            bundle = ModelBundle(
+                version=version,
+                models=MappingProxyType(base),
+                created_at=payload["created_at"],
+            )
+            self._bundle = bundle
+            self._checked_at = time.monotonic()
+
+        self._prune(keep=version)
+        return bundle
+
+    def _prune(self, keep: str):
+        # Version names sort by creation time; a bundle still being read by a
+        # slow worker stays valid because open files survive the unlink.
+        versions = sorted(f for f in os.listdir(self.root) if f.endswith(".pkl"))
+        for filename in versions[:-KEEP_VERSIONS]:
+            if filename != f"{keep}.pkl":
+                os.remove(os.path.join(self.root, filename))
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def current_models():
+    """The models of ONE version for the current request ({} while loading)."""
+    bundle = MODEL_REGISTRY.current()
+    return bundle.models if bundle is not None else {}
@@ -0,0 +1,192 @@
+import contextvars
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# --- CONFIGURATION ---
+# Opt-in: with SQL_PROFILE unset the engine hooks return immediately
+SQL_PROFILE = os.getenv("SQL_PROFILE", "").lower() in ("1", "true", "yes", "on")
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "100"))
+# The same statement shape this often in one request looks like an N+1 loop
+REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "5"))
+MAX_LOGGED_CHARS = 300
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\([^)]+\)s|%s|:\w+|\$\d+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """
+    The shape of a statement: literals and placeholders become `?` and IN
+    lists of any length collapse, so a loop of per-id lookups maps to ONE
+    fingerprint however many ids it walks.
+    """
+    shape = _STRING.sub("?", statement)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("(?, ...)", shape)
+    return _SPACES.sub(" ", shape).strip()
+
+
+def redact(parameters):
+    """Bound parameters with every value replaced by its type name."""
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"  # executemany
+        return [type(v).__name__ for v in parameters]
+    return type(parameters).__name__
+
+
+def _shorten(statement: str) -> str:
+    statement = _SPACES.sub(" ", statement).strip()
+    if len(statement) <= MAX_LOGGED_CHARS:
+        return statement
+    return statement[:MAX_LOGGED_CHARS] + "..."
+
+
+class QueryProfile:
+    """Statements of one request (or one `profile_queries` block)."""
+
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.statements = []  # (fingerprint, seconds)
+        self.closed = False  # Work after the response (background tasks) is not ours
+
+    def record(self, statement: str, seconds: float):
+        self.statements.append((fingerprint(statement), seconds))
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def seconds(self) -> float:
+        return sum(s for _, s in self.statements)
+
+    def repeated(self, threshold: int = REPEAT_THRESHOLD) -> list:
+        """[(fingerprint, times)] for shapes executed at least `threshold` times."""
+        counts = Counter(shape for shape, _ in self.statements)
+        return [(shape, n) for shape, n in counts.most_common() if n >= threshold]
+
+    def summary(self) -> str:
+        lines = [
+            f"{self.label or 'block'}: {self.count} queries, {self.seconds * 1000:.1f} ms"
+        ]
+        counts = Counter(shape for shape, _ in self.statements)
+        for shape, n in counts.most_common():
+            lines.append(f"   {n:>4}x {_shorten(shape)}")
+        return "\n".join(lines)
+
+
+_current_profile = contextvars.ContextVar("optistock_query_profile", default=None)
+
+# Open assert_query_budget blocks; each collects the request profiles that
+# finish while it is open (requests run on another thread under TestClient)
+_budget_watchers = []
+
+
+def enabled() -> bool:
+    return SQL_PROFILE or bool(_budget_watchers)
+
+
+@contextmanager
+def profile_queries(label: str = ""):
+    """Records every statement run in this context while the block is open."""
+    profile = QueryProfile(label)
+    token = _current_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.closed = True
+        _current_profile.reset(token)
+        for watcher in _budget_watchers:
+            watcher.append(profile)
+
+
+def report(profile: QueryProfile, threshold: int = REPEAT_THRESHOLD):
+    """Prints a warning when the profile contains a likely N+1 pattern."""
+    repeated = profile.repeated(threshold)
+    if not repeated:
+        return
+    print(f"🔁 Possible N+1 in {profile.label or 'block'} ({profile.count} queries):")
+    for shape, n in repeated:
+        print(f"   {n}x {_shorten(shape)}")
+
+
+# --- ENGINE HOOKS ---
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    if profile is None:
+        return
+    seconds = time.perf_counter() - conn.info["profile_started"].pop()
+    if profile.closed:
+        return
+    profile.record(statement, seconds)
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        print(
+            f"🐢 Slow query ({seconds * 1000:.0f} ms) in {profile.label or 'block'}: "
+            f"{_shorten(statement)} params={redact(parameters)}"
+        )
+
+
+def profile_engine(db_engine):
+    """Hooks the profiler into `db_engine` (a sync Engine)."""
+    event.listen(db_engine, "before_cursor_execute", _before_execute)
+    event.listen(db_engine, "after_cursor_execute", _after_execute)
+
+
+# --- TEST HELPER ---
+
+
+@contextmanager
+def assert_query_budget(max_queries: int, max_repeats: int = None):
+    """
+    Fails (AssertionError) when any request made inside the block, or the
+    block's own DB work, runs more than `max_queries` statements, or the
+    same statement shape more than `max_repeats` times:
+
+        with assert_query_budget(6, max_repeats=1):
+            client.post("/pos/checkout", json=cart)
+
+    Works without SQL_PROFILE: an open budget turns profiling on.
+    """
+    finished = []
+    _budget_watchers.append(finished)
+    try:
+        with profile_queries("assert_query_budget") as own:
+            yield finished
+    finally:
+        _budget_watchers.remove(finished)
+    finished.remove(own)  # Yielded list: the requests' profiles only
+
+    for profile in finished + ([own] if own.count else []):
+        problems = []
+        if profile.count > max_queries:
+            problems.append(f"{profile.count} queries (budget {max_queries})")
+        if max_repeats is not None:
+            worst = profile.repeated(max_repeats + 1)
+            if worst:
+                problems.append(
+                    f"a statement repeated {worst[0][1]}x (budget {max_repeats})"
+                )
+        if problems:
+            raise AssertionError(
+                f"Query budget exceeded: {', '.join(problems)}\n{profile.summary()}"
+            )
@@ -0,0 +1,98 @@
+import argparse
+from sqlalchemy import select, func, delete, insert
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import SessionLocal, engine, Transaction, DailyProductSales
+
+
+def sales_upsert(dialect_name: str):
+    """INSERT ... ON CONFLICT for the active backend (SQLite or Postgres)."""
+    dialect = sqlite if dialect_name == "sqlite" else postgresql
+    stmt = dialect.insert(DailyProductSales)
+    return stmt.on_conflict_do_update(
+        index_elements=["product_id", "day"],
+        set_={
+            "quantity": DailyProductSales.quantity + stmt.excluded.quantity,
+            "revenue": DailyProductSales.revenue + stmt.excluded.revenue,
+        },
+    )
+
+
+def sales_rows(day, items) -> list:
+    """
+    One rollup row per product of a checkout. `items` is an iterable of
+    (product_id, quantity, revenue); repeated products are summed.
+    """
+    totals = {}
+    for product_id, quantity, revenue in items:
+        qty, rev = totals.get(product_id, (0, 0.0))
+        totals[product_id] = (qty + quantity, rev + revenue)
+
+    return [
+        {"product_id": pid, "day": day, "quantity": qty, "revenue": rev}
+        for pid, (qty, rev) in totals.items()
+    ]
+
+
+def record_sales(db: Session, day, items):
+    """
+    Adds a checkout to the rollup inside the caller's DB transaction;
+    one executemany upsert covers the whole cart.
+    """
+    rows = sales_rows(day, items)
+    if rows:
+        db.execute(sales_upsert(db.get_bind().dialect.name), rows)
+
+
+def backfill_statement():
+    """INSERT ... SELECT ... GROUP BY building the rollup from `transactions`."""
+    day = func.date(Transaction.timestamp)
+    aggregate = (
+        select(
+            Transaction.product_id,
+            day,
+            func.sum(Transaction.quantity),
+            func.coalesce(func.sum(Transaction.total_price), 0.0),
+        )
+        .where(Transaction.timestamp.is_not(None))
+        .where(Transaction.product_id.is_not(None))
+        .group_by(Transaction.product_id, day)
+    )
+    return insert(DailyProductSales).from_select(
+        ["product_id", "day", "quantity", "revenue"], aggregate
+    )
+
+
+def backfill(db: Session) -> int:
+    """
+    Rebuilds the whole rollup from `transactions` with a single
+    INSERT ... SELECT ... GROUP BY executed inside the database.
+    """
+    db.execute(delete(DailyProductSales))
+    db.execute(backfill_statement())
+    db.commit()
+    return db.query(func.count()).select_from(DailyProductSales).scalar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily sales rollup.")
+    parser.add_argument(
+        "--backfill",
+        action="store_true",
+        help="Rebuild daily_product_sales from the transactions table.",
+    )
+    args = parser.parse_args()
+
+    if args.backfill:
+        from migrations import upgrade  # migrations.py imports this module
+
+        upgrade(engine)
+        session = SessionLocal()
+        try:
+            print("📊 Rebuilding daily_product_sales from transactions...")
+            print(f"✅ Rollup ready: {backfill(session)} product-days.")
+        finally:
+            session.close()
+    else:
+        parser.print_help()
@@ -10,6 +10,11 @@ class ForecastRequest(BaseModel):
     price_override: Optional[float] = None
 
 
+class BatchForecastRequest(BaseModel):
+    # Each item can carry its own price override for "What-If" analysis
+    items: list[ForecastRequest]
+
+
 # --- OUTPUT SCHEMAS (What we send back) ---
 
 
@@ -25,3 +30,9 @@ class ForecastResponse(BaseModel):
     product_id: int
     predicted_sales: int
     confidence_score: float  # Mocked for now, but good to have
+    product_name: Optional[str] = None
+
+
+class BatchForecastResponse(BaseModel):
+    predictions: list[ForecastResponse]
+    not_found: list[int]  # Requested IDs that are not in the catalog
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, update
+from sqlalchemy.orm import Session
+
+from database import Transaction, Customer
+from metrics import timed
+
+BUDGET_SPEND_LIMIT = 50  # Non-VIP customers below this total are "Budget"
+
+
+def customer_rfm_query(customer_id: int):
+    """
+    Recency / Frequency / Monetary inputs for one customer in ONE aggregate
+    query, plus the newest transaction in the database.
+    """
+    newest_sale = select(func.max(Transaction.timestamp)).scalar_subquery()
+    return select(
+        func.max(Transaction.timestamp),
+        func.count(Transaction.id),
+        func.coalesce(func.sum(Transaction.total_price), 0.0),
+        newest_sale,
+    ).where(Transaction.customer_id == customer_id)
+
+
+def rfm_from_row(row):
+    """
+    (recency, frequency, monetary) from a customer_rfm_query row. Recency
+    follows the training script: days between the customer's last purchase
+    and the day after the newest transaction in the database.
+    Returns None when the customer has no history.
+    """
+    last_active, frequency, monetary, newest = row
+    if not frequency:
+        return None
+
+    recency = 0
+    if last_active is not None and newest is not None:
+        recency = (newest - last_active).days + 1
+
+    return recency, int(frequency), float(monetary)
+
+
+def customer_rfm(db: Session, customer_id: int):
+    return rfm_from_row(db.execute(customer_rfm_query(customer_id)).one())
+
+
+def all_customers_rfm(db: Session) -> pd.DataFrame:
+    """RFM for every customer with history, from ONE grouped query."""
+    newest_sale = select(func.max(Transaction.timestamp)).scalar_subquery()
+    rows = db.execute(
+        select(
+            Transaction.customer_id,
+            func.max(Transaction.timestamp),
+            func.count(Transaction.id),
+            func.coalesce(func.sum(Transaction.total_price), 0.0),
+            newest_sale,
+        )
+        .where(Transaction.customer_id.is_not(None))
+        .group_by(Transaction.customer_id)
+    ).all()
+    df = pd.DataFrame(
+        rows, columns=["customer_id", "last_active", "frequency", "monetary", "newest"]
+    )
+
+    gap = pd.to_datetime(df["newest"]) - pd.to_datetime(df["last_active"])
+    df["recency"] = (gap.dt.days + 1).fillna(0).astype(int)
+    return df[["customer_id", "recency", "frequency", "monetary"]]
+
+
+def score_all_customers(db: Session, models: dict) -> dict:
+    """
+    Batch job: one RFM query, one scaler/KMeans call over the whole matrix,
+    and one executemany UPDATE writing customers.segment.
+    Customers without any purchase keep their current segment ("New").
+    Returns how many customers landed in each segment.
+    """
+    rfm = all_customers_rfm(db)
+    if rfm.empty:
+        return {}
+
+    features = rfm[["recency", "frequency", "monetary"]].to_numpy(dtype=float)
+    clusters = predict_clusters(models, features)
+    segments = label_segments(
+        clusters, rfm["monetary"].to_numpy(), models["meta"]["vip_cluster"]
+    )
+
+    db.execute(
+        update(Customer),
+        [
+            {"id": int(cid), "segment": str(seg)}
+            for cid, seg in zip(rfm["customer_id"], segments)
+        ],
+    )
+    db.commit()
+
+    names, counts = np.unique(segments, return_counts=True)
+    return {str(n): int(c) for n, c in zip(names, counts)}
+
+
+def predict_clusters(models: dict, rfm: np.ndarray) -> np.ndarray:
+    """Scales an (n x 3) RFM matrix and assigns every row to a cluster at once."""
+    scaler = models["scaler"]
+    # The scaler was fitted on a (recency, frequency, monetary) DataFrame
+    columns = getattr(scaler, "feature_names_in_", None)
+    if columns is not None:
+        rfm = pd.DataFrame(rfm, columns=columns)
+    with timed("segment_inference"):
+        scaled = scaler.transform(rfm)
+        return models["kmeans"].predict(scaled)
+
+
+def label_segments(
+    clusters: np.ndarray, monetary: np.ndarray, vip_cluster
+) -> np.ndarray:
+    """Turns cluster IDs into the business names: VIP, Budget or Regular."""
+    return np.select(
+        [clusters == vip_cluster, monetary < BUDGET_SPEND_LIMIT],
+        ["VIP", "Budget"],
+        default="Regular",
+    )
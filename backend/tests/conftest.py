@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# The API modules read their configuration at import time: point them at a
+# throwaway database and model folder before any test imports them.
+_TMP_DIR = tempfile.mkdtemp(prefix="optistock-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'api.db')}"
+os.environ["MODEL_DIR"] = os.path.join(_TMP_DIR, "ml-engine")
+os.environ["RETRAIN_WORKER"] = "external"
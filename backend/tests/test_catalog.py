@@ -0,0 +1,25 @@
+import pytest
+
+from catalog import catalog_etag, etag_matches
+
+ETAG = catalog_etag(7, "limit=2")  # W/"catalog-7-..."
+STRONG = ETAG[2:]
+
+
+@pytest.mark.parametrize(
+    "if_none_match, matches",
+    [
+        (ETAG, True),
+        (STRONG, True),  # Weak comparison ignores W/
+        (f'"other", {ETAG}', True),
+        (f'W/"other",{STRONG}', True),
+        ("*", True),
+        ("", False),
+        ('W/"other"', False),
+        (STRONG[:-2] + '"', False),  # A prefix of the tag is not the tag
+        (f'"x{STRONG[1:]}', False),
+        (f"{ETAG}-stale", False),
+    ],
+)
+def test_if_none_match_compares_whole_tags(if_none_match, matches):
+    assert etag_matches(ETAG, if_none_match) is matches
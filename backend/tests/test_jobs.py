@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import jobs
+import worker
+from database import Job
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Job.__table__.create(db_engine)
+    return sessionmaker(bind=db_engine)
+
+
+def test_claim_next_fails_only_jobs_that_missed_heartbeats(session_factory):
+    now = datetime.now()
+    with session_factory() as db:
+        db.add_all(
+            [
+                Job(kind="a", status="running", heartbeat_at=now, active_key="a"),
+                Job(
+                    kind="b",
+                    status="running",
+                    heartbeat_at=now - jobs.STALE_AFTER * 2,
+                    active_key="b",
+                ),
+            ]
+        )
+        db.commit()
+
+        assert jobs.claim_next(db) is None
+        statuses = dict(db.query(Job.kind, Job.status))
+
+    assert statuses == {"a": "running", "b": "failed"}
+
+
+def test_worker_beats_while_a_job_is_busy(session_factory, monkeypatch):
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(worker, "SessionLocal", session_factory)
+    with session_factory() as db:
+        job = jobs.enqueue(db, "slow")
+        job = jobs.claim_next(db)
+        job_id, started_at = job.id, job.started_at
+
+    seen = []
+
+    def slow_fit(progress):
+        time.sleep(0.3)  # One long stage without any progress report
+        with session_factory() as db:
+            seen.append(db.get(Job, job_id).heartbeat_at)
+        return "Done"
+
+    monkeypatch.setitem(worker.HANDLERS, "slow", slow_fit)
+    worker.run_job(job_id, "slow")
+
+    assert seen[0] > started_at
+    with session_factory() as db:
+        assert db.get(Job, job_id).status == "succeeded"
+
+
+def test_periodic_jobs_are_queued_once_per_interval(session_factory):
+    every = timedelta(minutes=15)
+    with session_factory() as db:
+        first = jobs.enqueue_if_due(db, "reorder_refresh", every)
+        jobs.claim_next(db)
+        jobs.finish(db, first.id, True, "Done")
+
+        # Another worker polling right after must not queue a second one
+        assert jobs.enqueue_if_due(db, "reorder_refresh", every) is None
+
+        db.query(Job).update({Job.created_at: datetime.now() - every})
+        db.commit()
+        assert jobs.enqueue_if_due(db, "reorder_refresh", every) is not None
+        assert db.query(Job).count() == 2
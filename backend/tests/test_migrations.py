@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Customer, DailyProductSales, Product, Transaction
+from migrations import check_query_plans, upgrade
+
+
+@pytest.fixture
+def db_engine(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'migrated.db'}")
+    upgrade(db_engine)
+    return db_engine
+
+
+def test_migrations_build_the_whole_schema(db_engine):
+    assert set(inspect(db_engine).get_table_names()) == set(Base.metadata.tables)
+    assert upgrade(db_engine) == []  # Nothing left to apply
+
+
+def test_hot_queries_never_scan_a_whole_table(db_engine):
+    now = datetime.now()
+    with sessionmaker(bind=db_engine)() as db:
+        db.add_all(
+            Product(id=i, name=f"P{i}", category="Home", base_price=1.0, stock=9)
+            for i in range(1, 51)
+        )
+        db.add_all(Customer(id=i, name=f"C{i}") for i in range(1, 21))
+        db.add_all(
+            Transaction(
+                customer_id=i % 20 + 1,
+                product_id=i % 50 + 1,
+                quantity=1,
+                total_price=1.0,
+                timestamp=now - timedelta(hours=i),
+            )
+            for i in range(500)
+        )
+        db.add_all(
+            DailyProductSales(
+                product_id=p, day=(now - timedelta(days=d)).date(), quantity=1
+            )
+            for p in range(1, 51)
+            for d in range(30)
+        )
+        db.commit()
+
+    scans = {
+        name: lines for name, lines in check_query_plans(db_engine).items() if lines
+    }
+
+    assert scans == {}
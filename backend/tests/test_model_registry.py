@@ -0,0 +1,57 @@
+import pickle
+
+import pytest
+
+import model_registry
+from model_registry import LEGACY_FILES, ModelRegistry
+
+
+@pytest.fixture
+def ml_engine_dir(tmp_path, monkeypatch):
+    # Keep the repo's real ml-engine/*.pkl out of these tests
+    monkeypatch.setattr(model_registry, "ML_ENGINE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_publish_from_fresh_registry_carries_over_published_models(ml_engine_dir):
+    root = str(ml_engine_dir / "registry")
+    ModelRegistry(root).publish(
+        {"kmeans": "kmeans-1", "scaler": "scaler-1", "forecast": "forecast-1"}
+    )
+
+    # A new process (the retrain worker) has loaded nothing before publishing
+    bundle = ModelRegistry(root).publish({"forecast": "forecast-2", "encoder": "enc-2"})
+
+    assert dict(bundle.models) == {
+        "kmeans": "kmeans-1",
+        "scaler": "scaler-1",
+        "forecast": "forecast-2",
+        "encoder": "enc-2",
+    }
+    served = ModelRegistry(root).refresh()
+    assert served.version == bundle.version
+    assert dict(served.models) == dict(bundle.models)
+
+
+def test_first_publish_carries_over_legacy_models(ml_engine_dir):
+    for name, filename in LEGACY_FILES.items():
+        (ml_engine_dir / filename).write_bytes(pickle.dumps(f"{name}-legacy"))
+
+    bundle = ModelRegistry(str(ml_engine_dir / "registry")).publish(
+        {"forecast": "forecast-2", "encoder": "enc-2"}
+    )
+
+    assert bundle.models["kmeans"] == "kmeans-legacy"
+    assert bundle.models["meta"] == "meta-legacy"
+    assert bundle.models["forecast"] == "forecast-2"
+
+
+def test_unloadable_legacy_models_are_treated_as_absent(ml_engine_dir):
+    for filename in LEGACY_FILES.values():
+        (ml_engine_dir / filename).write_bytes(b"not a pickle")
+
+    bundle = ModelRegistry(str(ml_engine_dir / "registry")).publish(
+        {"forecast": "forecast-2", "encoder": "enc-2"}
+    )
+
+    assert dict(bundle.models) == {"forecast": "forecast-2", "encoder": "enc-2"}
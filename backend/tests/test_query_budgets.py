@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+import main
+import training
+from database import Base, Customer, Product, SessionLocal, Transaction, engine
+from migrations import upgrade
+from model_registry import MODEL_REGISTRY
+from query_profiler import assert_query_budget
+
+PRODUCTS = [(1, "Mug", "Home", 4.5), (2, "Pen", "Office", 1.0), (3, "Lamp", "Home", 20)]
+CART = {
+    "items": [
+        {"product_id": 1, "quantity": 2, "price": 4.5},
+        {"product_id": 2, "quantity": 1, "price": 1.0},
+        {"product_id": 3, "quantity": 1, "price": 20.0},
+        {"product_id": 1, "quantity": 1, "price": 4.5},  # Repeated line
+    ]
+}
+
+
+def seed_database():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    today = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    with SessionLocal() as db:
+        db.add_all(
+            Product(id=i, name=n, category=c, base_price=p, stock=1000)
+            for i, n, c, p in PRODUCTS
+        )
+        db.add(Customer(id=1, name="Walk-in", email="shop@example.com"))
+        db.add_all(
+            Transaction(
+                customer_id=1,
+                product_id=product_id,
+                quantity=(day % 3) + 1,
+                total_price=5.0,
+                timestamp=today - timedelta(days=day),
+            )
+            for product_id, *_ in PRODUCTS
+            for day in range(21)
+        )
+        db.commit()
+
+
+def publish_segment_models():
+    rfm = np.array([[1, 30, 500.0], [20, 5, 40.0], [3, 25, 450.0], [40, 2, 10.0]])
+    scaler = StandardScaler().fit(rfm)
+    kmeans = KMeans(n_clusters=2, n_init=10, random_state=0).fit(scaler.transform(rfm))
+    MODEL_REGISTRY.publish(
+        {"kmeans": kmeans, "scaler": scaler, "meta": {"vip_cluster": 0}}
+    )
+
+
+@pytest.fixture(scope="module")
+def client():
+    seed_database()
+    upgrade(engine)  # The deploy step; builds the rollup from the seed
+    publish_segment_models()
+    with TestClient(main.app) as test_client:
+        training.retrain_models_task()  # Forecast model + reorder report
+        yield test_client
+
+
+def test_checkout_stays_within_four_statements(client):
+    with assert_query_budget(4, max_repeats=1) as profiles:
+        response = client.post("/pos/checkout", json=CART)
+
+    assert response.status_code == 200
+    assert [p.count for p in profiles] == [4]
+
+
+@pytest.mark.parametrize(
+    "method, path, body, budget",
+    [
+        ("get", "/products", None, 2),
+        ("get", "/products?limit=2&fields=id,name&category=Home", None, 2),
+        ("post", "/forecast/predict", {"product_id": 1}, 2),
+        (
+            "post",
+            "/forecast/predict-batch",
+            {"items": [{"product_id": i} for i in (1, 2, 3, 99)]},
+            2,
+        ),
+        ("get", "/analytics/reorder-report", None, 2),
+        ("get", "/analytics/segment/1", None, 1),
+        ("get", "/analytics/dashboard", None, 3),
+    ],
+)
+def test_hot_endpoint_query_budget(client, method, path, body, budget):
+    main.DASHBOARD_CACHE.invalidate()  # Measure the uncached dashboard
+    with assert_query_budget(budget, max_repeats=1) as profiles:
+        response = getattr(client, method)(path, **({"json": body} if body else {}))
+
+    assert response.status_code == 200
+    assert len(profiles) == 1
+
+
+def test_products_answer_304_for_any_listed_etag(client):
+    etag = client.get("/products").headers["etag"]
+
+    listed = client.get("/products", headers={"If-None-Match": f'"old", {etag[2:]}'})
+    stale = client.get("/products", headers={"If-None-Match": f"{etag}-stale"})
+
+    assert listed.status_code == 304
+    assert stale.status_code == 200
@@ -0,0 +1,92 @@
+from datetime import date, timedelta
+
+import pytest
+from sklearn.preprocessing import LabelEncoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, DailyProductSales, Product, ReorderReport
+from forecasting import predict_batch, refresh_reorder_report, score_catalog
+from schemas import ForecastRequest
+
+TODAY = date(2024, 3, 31)
+
+
+class LastDaySales:
+    """Stand-in forecast model: predicts yesterday's units (lag_1)."""
+
+    def predict(self, features):
+        return features["lag_1"].to_numpy()
+
+
+@pytest.fixture
+def db(tmp_path):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'report.db'}")
+    Base.metadata.create_all(db_engine)
+    with sessionmaker(bind=db_engine)() as session:
+        session.add_all(
+            Product(id=i, name=f"P{i}", category="Home", base_price=2.0, stock=50)
+            for i in (1, 2, 3)
+        )
+        # 1 sells until today, 2 stopped 10 days ago, 3 never sold
+        session.add_all(
+            DailyProductSales(
+                product_id=product_id, day=last - timedelta(days=d), quantity=q
+            )
+            for product_id, last, q in ((1, TODAY, 3), (2, TODAY - timedelta(10), 9))
+            for d in range(14)
+        )
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def models():
+    return {"forecast": LastDaySales(), "encoder": LabelEncoder().fit(["Home"])}
+
+
+def test_catalog_scores_each_product_as_of_its_own_last_sale(db, models):
+    scored = score_catalog(db, models).set_index("product_id")["predicted_demand"]
+    served = {
+        p["product_id"]: p["predicted_sales"]
+        for p in predict_batch(
+            db, models, [ForecastRequest(product_id=i) for i in (1, 2, 3)]
+        )["predictions"]
+    }
+
+    # A sale today must not zero the lags of product 2
+    assert scored.to_dict() == {1: 3, 2: 9, 3: 0}
+    assert scored.to_dict() == served
+
+
+def report(db):
+    return dict(db.query(ReorderReport.product_id, ReorderReport.predicted_demand))
+
+
+def test_refresh_upserts_over_existing_rows(db, models):
+    assert refresh_reorder_report(db, models) == 3
+    # A partial refresh racing the full one rewrites rows instead of
+    # colliding on the primary key
+    assert refresh_reorder_report(db, models, [1, 2]) == 2
+    assert refresh_reorder_report(db, models) == 3
+
+    assert report(db) == {1: 3, 2: 9, 3: 0}
+
+
+def test_refresh_drops_rows_of_deleted_products(db, models):
+    refresh_reorder_report(db, models)
+    db.query(DailyProductSales).filter_by(product_id=3).delete()
+    db.query(Product).filter_by(id=3).delete()
+    db.commit()
+
+    refresh_reorder_report(db, models, [3])
+
+    assert report(db) == {1: 3, 2: 9}
+
+
+def test_refresh_is_skipped_without_a_forecast_model(db, models):
+    refresh_reorder_report(db, models)
+
+    assert refresh_reorder_report(db, {}) == 0
+    # The last scored rows stay instead of every product turning "OK"
+    assert report(db) == {1: 3, 2: 9, 3: 0}
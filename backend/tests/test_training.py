@@ -0,0 +1,84 @@
+from datetime import date, timedelta
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import model_registry
+import training
+from database import Base, DailyProductSales, Product
+from model_registry import ModelRegistry
+
+
+def test_retrain_ignores_sales_of_deleted_products(tmp_path, monkeypatch):
+    db_engine = create_engine(f"sqlite:///{tmp_path / 'train.db'}")
+    Base.metadata.create_all(db_engine)
+    session_factory = sessionmaker(bind=db_engine)
+    monkeypatch.setattr(model_registry, "ML_ENGINE_DIR", str(tmp_path))  # No legacy
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    monkeypatch.setattr(training, "engine", db_engine)
+    monkeypatch.setattr(training, "SessionLocal", session_factory)
+    monkeypatch.setattr(training, "MODEL_REGISTRY", registry)
+
+    start = date(2024, 1, 1)
+    with session_factory() as db:
+        db.add_all(
+            [
+                Product(id=1, name="Mug", category="Home", base_price=4.5, stock=10),
+                Product(id=2, name="Pen", category="Office", base_price=1.0, stock=3),
+            ]
+        )
+        # Product 3 was deleted but its rollup rows are still there
+        db.add_all(
+            DailyProductSales(
+                product_id=product_id,
+                day=start + timedelta(days=d),
+                quantity=(d % 4) + product_id,
+                revenue=0.0,
+            )
+            for product_id in (1, 2, 3)
+            for d in range(21)
+        )
+        db.commit()
+
+    assert training.retrain_models_task().startswith("Published model version")
+    encoder = registry.current().models["encoder"]
+    assert list(encoder.classes_) == ["Home", "Office"]
+
+
+def test_retrain_only_builds_feature_rows_for_new_days(tmp_path, monkeypatch):
+    monkeypatch.setattr(training, "FEATURE_CACHE", str(tmp_path / "features.pkl"))
+    start = pd.Timestamp("2024-01-01")
+    daily = pd.DataFrame(
+        {
+            "product_id": [p for p in (1, 2) for d in range(30)],
+            "date": [start + pd.Timedelta(days=d) for p in (1, 2) for d in range(30)],
+            "quantity": [float((d * p) % 5) for p in (1, 2) for d in range(30)],
+        }
+    )
+    # Day 20 was still being sold on at the first retrain
+    partial = daily[daily["date"] <= start + pd.Timedelta(days=20)].copy()
+    partial.loc[partial["date"] == partial["date"].max(), "quantity"] = 0.0
+    training.cached_training_rows(partial)
+
+    built = []
+    real_training_rows = training.training_rows
+
+    def spy(daily, cached=None):
+        built.append(cached is not None)
+        return real_training_rows(daily, cached)
+
+    monkeypatch.setattr(training, "training_rows", spy)
+    rows = training.cached_training_rows(daily)
+
+    key = ["product_id", "date"]
+    assert built == [True]
+    pd.testing.assert_frame_equal(
+        rows.sort_values(key).reset_index(drop=True),
+        real_training_rows(daily).sort_values(key).reset_index(drop=True),
+    )
+
+    # A rewritten past day invalidates the cache
+    daily.loc[0, "quantity"] += 1
+    training.cached_training_rows(daily)
+    assert built == [True, False]
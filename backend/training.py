@@ -0,0 +1,199 @@
+import os
+
+import pandas as pd
+from sqlalchemy import select, func
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.preprocessing import LabelEncoder
+
+from database import SessionLocal, engine, Product, Transaction, DailyProductSales
+from forecasting import refresh_reorder_report
+import model_registry
+from model_registry import MODEL_REGISTRY
+from optistock.features import FEATURE_COLUMNS, training_rows
+
+TRAIN_CHUNK_ROWS = int(os.getenv("TRAIN_CHUNK_ROWS", "50000"))
+# Feature rows of the last retrain; the next one only builds the new days
+FEATURE_CACHE = os.getenv("FEATURE_CACHE")
+
+# Compact dtypes: a product-day costs 16 bytes instead of ~100 with objects
+DAILY_DTYPES = {"product_id": "int32", "quantity": "float32"}
+
+
+def _no_progress(fraction: float, message: str):
+    pass
+
+
+def daily_sales_query():
+    """
+    Units per product per day, aggregated inside the database.
+    Reads the rollup; falls back to a GROUP BY over `transactions`
+    while the rollup has not been backfilled yet.
+    """
+    with engine.connect() as conn:
+        has_rollup = conn.execute(select(DailyProductSales.product_id).limit(1)).first()
+
+    if has_rollup is not None:
+        return select(
+            DailyProductSales.product_id,
+            DailyProductSales.day.label("date"),
+            DailyProductSales.quantity,
+        )
+
+    day = func.date(Transaction.timestamp)
+    return (
+        select(
+            Transaction.product_id,
+            day.label("date"),
+            func.sum(Transaction.quantity).label("quantity"),
+        )
+        .where(Transaction.timestamp.is_not(None))
+        .where(Transaction.product_id.is_not(None))
+        .group_by(Transaction.product_id, day)
+    )
+
+
+def load_daily_sales(chunk_rows: int = TRAIN_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Streams the aggregated daily sales in `chunk_rows` pieces, shrinking
+    each chunk to compact dtypes before the next one is fetched, so peak
+    memory is one raw chunk plus the compact result.
+    """
+    chunks = []
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        for chunk in pd.read_sql(daily_sales_query(), conn, chunksize=chunk_rows):
+            chunk = chunk.dropna(subset=["product_id", "date"]).astype(DAILY_DTYPES)
+            chunk["date"] = pd.to_datetime(chunk["date"])
+            chunks.append(chunk)
+
+    if not chunks:
+        return pd.DataFrame(columns=["product_id", "date", "quantity"])
+    return pd.concat(chunks, ignore_index=True)
+
+
+def feature_cache_path() -> str:
+    return FEATURE_CACHE or os.path.join(
+        model_registry.ML_ENGINE_DIR, "feature_rows.pkl"
+    )
+
+
+def _history_fingerprint(daily: pd.DataFrame, before) -> tuple:
+    # Changes when a day before `before` is rewritten under the cached rows
+    old = (daily["date"] < before).to_numpy()
+    # float64 sums of whole units are exact, whatever the row order
+    return int(old.sum()), float(daily["quantity"].to_numpy("float64")[old].sum())
+
+
+def cached_training_rows(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    training_rows() resumed from the rows cached by the previous retrain.
+    The cache is ignored (full rebuild) when it is missing, unreadable, or
+    the sales history it was built from has changed since, e.g. after
+    `python rollups.py --backfill`.
+    """
+    path = feature_cache_path()
+    try:
+        cache = pd.read_pickle(path)
+    except Exception:
+        cache = None
+    if cache is not None and cache["fingerprint"] != _history_fingerprint(
+        daily, cache["until"]
+    ):
+        print("   Sales history changed: rebuilding every feature row.")
+        cache = None
+
+    rows = training_rows(daily, cached=cache["rows"] if cache is not None else None)
+
+    if not rows.empty:
+        # The newest day may still be partial; the next run rebuilds it anyway
+        until = daily["date"].max()
+        cache = {
+            "rows": rows,
+            "until": until,
+            "fingerprint": _history_fingerprint(daily, until),
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pd.to_pickle(cache, tmp_path)
+        os.replace(tmp_path, path)  # A crash mid-write leaves the old cache
+    return rows
+
+
+# --- TRAINING SERVICE (runs in the retrain worker process) ---
+def retrain_models_task(progress=_no_progress):
+    """
+    Retrains the forecast model + category encoder from the daily rollup and
+    publishes them as one new registry version.
+    `progress(fraction, message)` is called between stages.
+    Raises on failure so the job is recorded as failed.
+    """
+    print("🔄 ADMIN: Starting automated retraining...")
+
+    # Daily totals are aggregated in SQL; only 3 columns cross the wire
+    progress(0.05, "Loading daily sales")
+    daily = load_daily_sales()
+
+    if daily.empty:
+        print("⚠️ ADMIN: Not enough data to train.")
+        raise ValueError("Not enough data to train.")
+
+    products = pd.read_sql(
+        select(Product.id.label("product_id"), Product.category, Product.base_price),
+        engine,
+    ).astype({"product_id": "int32", "base_price": "float32"})
+
+    # Features (shared with ml-engine/train_forecasting.py and the API)
+    progress(0.3, "Engineering features")
+    # Inner join: rollup rows of deleted products have no price or category
+    data = cached_training_rows(daily).merge(products, on="product_id", how="inner")
+    del daily
+    if data.empty:
+        raise ValueError("Not enough data to train.")
+
+    le = LabelEncoder()
+    data["category_encoded"] = le.fit_transform(data["category"].astype(str))
+
+    X = data[FEATURE_COLUMNS]
+    y = data["quantity"]
+
+    progress(0.5, f"Fitting model on {len(X)} rows")
+    new_forecast_model = GradientBoostingRegressor(n_estimators=50, max_depth=3)
+    new_forecast_model.fit(X, y)
+
+    # One bundle, one reference swap: forecast + encoder change together,
+    # and every API worker picks the new version up from its stamp.
+    progress(0.85, "Publishing model version")
+    bundle = MODEL_REGISTRY.publish({"forecast": new_forecast_model, "encoder": le})
+    print(f"   Published model version {bundle.version}")
+    print("✅ ADMIN: AI Successfully Retrained & Hot-Swapped!")
+
+    # Materialized predictions came from the old model
+    progress(0.9, "Refreshing reorder report")
+    db = SessionLocal()
+    try:
+        refresh_reorder_report(db, bundle.models)
+    finally:
+        db.close()
+
+    return f"Published model version {bundle.version}"
+
+
+def refresh_reorder_report_task(progress=_no_progress):
+    """
+    Full rebuild of the materialized reorder report with the published
+    models. The worker queues one every REORDER_REFRESH_SECONDS, which picks
+    up everything the per-product refreshes miss (new sales days shifting
+    the lags, catalog edits).
+    """
+    bundle = MODEL_REGISTRY.current()
+    if bundle is None:
+        # Nothing to score with yet; the first retrain refreshes the report
+        return "Skipped: no published models"
+
+    progress(0.1, "Refreshing reorder report")
+    db = SessionLocal()
+    try:
+        count = refresh_reorder_report(db, bundle.models)
+    finally:
+        db.close()
+    return f"Reorder report rebuilt ({count} products)"
@@ -0,0 +1,107 @@
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from database import SessionLocal
+import jobs
+from training import retrain_models_task, refresh_reorder_report_task
+
+# --- CONFIGURATION ---
+POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "5"))
+# How often the materialized reorder report is fully rebuilt (seconds)
+REORDER_REFRESH_SECONDS = int(os.getenv("REORDER_REFRESH_SECONDS", "900"))
+
+# Job kind -> function(progress) returning a result message
+HANDLERS = {
+    "retrain": retrain_models_task,
+    "reorder_refresh": refresh_reorder_report_task,
+}
+
+# Job kind -> how often a worker queues one (once for all API processes)
+SCHEDULE = {
+    "reorder_refresh": timedelta(seconds=REORDER_REFRESH_SECONDS),
+}
+
+
+def keep_alive(job_id: int, stop: threading.Event):
+    """
+    Beats every HEARTBEAT_SECONDS until `stop` is set. Progress is only
+    reported between stages, and one model fit can outlast the stale window.
+    """
+    while not stop.wait(jobs.HEARTBEAT_SECONDS):
+        db = SessionLocal()  # Own session: the job's session is not thread-safe
+        try:
+            jobs.heartbeat(db, job_id)
+        except Exception as e:
+            print(f"⚠️ WORKER: Heartbeat for job {job_id} failed. {e}")
+        finally:
+            db.close()
+
+
+def run_job(job_id: int, kind: str):
+    db = SessionLocal()
+    stop = threading.Event()
+    beats = threading.Thread(
+        target=keep_alive, args=(job_id, stop), name="job-heartbeat", daemon=True
+    )
+    beats.start()
+    try:
+
+        def progress(fraction: float, message: str):
+            jobs.report_progress(db, job_id, fraction, message)
+
+        try:
+            result = HANDLERS[kind](progress)
+            jobs.finish(db, job_id, True, result or "Done")
+        except Exception as e:
+            traceback.print_exc()
+            print(f"❌ WORKER: Job {job_id} ({kind}) failed. Reason: {e}")
+            db.rollback()
+            jobs.finish(db, job_id, False, str(e))
+    finally:
+        stop.set()
+        beats.join()
+        db.close()
+
+
+def run_forever():
+    """Polls the jobs table and runs one job at a time, in this process."""
+    print(f"👷 WORKER: Waiting for jobs (pid {os.getpid()})...")
+    while True:
+        db = SessionLocal()
+        try:
+            for kind, every in SCHEDULE.items():
+                jobs.enqueue_if_due(db, kind, every)
+            job = jobs.claim_next(db)
+            claimed = (job.id, job.kind) if job is not None else None
+        except Exception as e:
+            print(f"❌ WORKER: Could not poll the job queue. {e}")
+            claimed = None
+        finally:
+            db.close()
+
+        if claimed is None:
+            time.sleep(POLL_SECONDS)
+        else:
+            print(f"👷 WORKER: Running job {claimed[0]} ({claimed[1]})...")
+            run_job(*claimed)
+
+
+def start_embedded_worker():
+    """
+    Starts the worker as a separate OS process next to the API, so training
+    never competes with requests for the API's GIL. Use RETRAIN_WORKER=external
+    and run `python worker.py` yourself to host it elsewhere.
+    """
+    process = multiprocessing.get_context("spawn").Process(
+        target=run_forever, name="optistock-worker", daemon=True
+    )
+    process.start()
+    return process
+
+
+if __name__ == "__main__":
+    run_forever()
@@ -0,0 +1,364 @@
+"""
+End-to-end HTTP load test for the API (backend/main.py).
+
+Seeds a throwaway SQLite database with the synthetic generator, trains
+models on it, starts the app under uvicorn and drives a weighted mix of
+endpoints from concurrent keep-alive clients. Reports throughput and
+p50/p95/p99 latency per endpoint, and writes them as JSON so runs can be
+compared:
+
+    python benchmarks/load_test.py --transactions 200000 --duration 30 \\
+        --output results/api.json
+    python benchmarks/load_test.py --baseline results/api.json
+
+With --baseline, exits 1 when an endpoint's p95 (or throughput) regresses
+by more than --tolerance.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BACKEND_DIR = os.path.join(ROOT, "backend")
+ML_ENGINE_DIR = os.path.join(ROOT, "ml-engine")
+sys.path.append(os.path.join(ROOT, "data"))
+
+# Endpoint -> share of the traffic (a store day: browsing, sales, dashboards)
+DEFAULT_MIX = {
+    "checkout": 20,
+    "products": 25,
+    "predict": 20,
+    "dashboard": 15,
+    "reorder_report": 10,
+    "segment": 10,
+}
+BENCH_STOCK = 1_000_000  # So checkouts keep succeeding for the whole run
+
+
+def build_request(name: str, rng: random.Random, sizes: dict):
+    """(method, path, body) of one request to endpoint `name`."""
+    product_id = rng.randint(1, sizes["products"])
+    if name == "checkout":
+        items = [
+            {
+                "product_id": rng.randint(1, sizes["products"]),
+                "quantity": rng.randint(1, 3),
+                "price": 10.0,
+            }
+            for _ in range(rng.randint(1, 4))
+        ]
+        return "POST", "/pos/checkout", {"items": items}
+    if name == "products":
+        after_id = rng.randint(0, max(sizes["products"] - 100, 0))
+        return "GET", f"/products?after_id={after_id}&limit=100", None
+    if name == "predict":
+        return "POST", "/forecast/predict", {"product_id": product_id}
+    if name == "dashboard":
+        return "GET", "/analytics/dashboard", None
+    if name == "reorder_report":
+        return "GET", "/analytics/reorder-report", None
+    if name == "segment":
+        customer_id = rng.randint(1, sizes["customers"])
+        return "GET", f"/analytics/segment/{customer_id}", None
+    raise ValueError(f"Unknown endpoint '{name}'")
+
+
+# --- ENVIRONMENT ---
+
+
+def run(cmd, env=None, cwd=None):
+    print(f"$ {' '.join(cmd)}", flush=True)
+    subprocess.run(cmd, env=env, cwd=cwd, check=True, stdout=subprocess.DEVNULL)
+
+
+def seed(workdir: str, args, env: dict):
+    """Synthetic dataset -> SQLite database (+ fresh models unless given)."""
+    from generate_data import generate_data
+
+    data_dir = os.path.join(workdir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    generate_data(
+        args.transactions,
+        args.products,
+        args.customers,
+        seed=args.seed,
+        data_dir=data_dir,
+    )
+    run([sys.executable, "init_db.py", "--data-dir", data_dir], env, BACKEND_DIR)
+
+    with sqlite3.connect(os.path.join(workdir, "bench.db")) as conn:
+        conn.execute("UPDATE products SET stock = ?", (BENCH_STOCK,))
+
+    if args.model_dir is None:
+        model_dir = env["MODEL_DIR"]
+        os.makedirs(model_dir, exist_ok=True)
+        for script in ("train_forecasting.py", "train_clustering.py"):
+            run([sys.executable, os.path.join(ML_ENGINE_DIR, script)], env, model_dir)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: dict, workers: int) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        + ["--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+    )
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("API server exited during startup")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("API server did not become ready")
+
+
+# --- LOAD ---
+
+
+def client_loop(port, mix, sizes, stop_at, seed_value, samples, lock):
+    """One keep-alive client issuing requests until `stop_at`."""
+    rng = random.Random(seed_value)
+    names, weights = list(mix), list(mix.values())
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    local = []
+
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights)[0]
+        method, path, body = build_request(name, rng, sizes)
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+
+        started = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = 0  # Connection-level failure
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local.append((name, status, time.perf_counter() - started))
+
+    conn.close()
+    with lock:
+        samples.extend(local)
+
+
+def drive(port, mix, sizes, concurrency, duration, seed_value) -> list:
+    samples, lock = [], threading.Lock()
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(
+            target=client_loop,
+            args=(port, mix, sizes, stop_at, seed_value + i, samples, lock),
+        )
+        for i in range(concurrency)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples
+
+
+def summarize(samples: list, duration: float) -> dict:
+    """Per-endpoint (and overall) throughput, latency percentiles, statuses."""
+    by_endpoint = {}
+    for name, status, seconds in samples:
+        by_endpoint.setdefault(name, []).append((status, seconds))
+    by_endpoint["ALL"] = [(status, seconds) for _, status, seconds in samples]
+
+    results = {}
+    for name, rows in sorted(by_endpoint.items()):
+        statuses = np.array([s for s, _ in rows])
+        latency_ms = np.array([t for _, t in rows]) * 1000
+        p50, p95, p99 = np.percentile(latency_ms, [50, 95, 99])
+        codes, counts = np.unique(statuses, return_counts=True)
+        results[name] = {
+            "requests": len(rows),
+            "throughput_rps": round(len(rows) / duration, 2),
+            "errors": int(((statuses == 0) | (statuses >= 500)).sum()),
+            "status_codes": {str(c): int(n) for c, n in zip(codes, counts)},
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "mean_ms": round(float(latency_ms.mean()), 2),
+            "max_ms": round(float(latency_ms.max()), 2),
+        }
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of p95 latency / throughput beyond `tolerance` (0.2 = 20%)."""
+    regressions = []
+    for name, now in results["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now["throughput_rps"] < before["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {before['throughput_rps']} -> "
+                f"{now['throughput_rps']} req/s"
+            )
+    return regressions
+
+
+def print_table(endpoints: dict):
+    print(
+        f"\n{'endpoint':<16}{'req':>8}{'req/s':>10}{'err':>6}"
+        f"{'p50':>9}{'p95':>9}{'p99':>9}  (ms)"
+    )
+    for name, r in endpoints.items():
+        print(
+            f"{name:<16}{r['requests']:>8}{r['throughput_rps']:>10}{r['errors']:>6}"
+            f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+        )
+
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the OptiStock API.")
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--customers", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30, help="Seconds.")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds.")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="Weights, e.g. checkout=1,products=3 (default: a store-day mix).",
+    )
+    parser.add_argument("--workdir", help="Keep the seeded DB/models here.")
+    parser.add_argument(
+        "--reuse", action="store_true", help="Skip seeding an existing --workdir."
+    )
+    parser.add_argument(
+        "--model-dir", help="Serve these models instead of training fresh ones."
+    )
+    parser.add_argument("--output", help="Write the JSON results here.")
+    parser.add_argument("--baseline", help="JSON results to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="optistock-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        DATASET_DIR=os.path.join(workdir, "data"),
+        MODEL_DIR=args.model_dir or os.path.join(workdir, "models"),
+        RETRAIN_WORKER="external",  # No background training during the run
+    )
+
+    if not args.reuse:
+        print(f"🌱 Seeding {args.transactions:,} transactions into {workdir}...")
+        seed(workdir, args, env)
+
+    sizes = {"products": args.products, "customers": args.customers}
+    port = free_port()
+    server = start_server(port, env, args.server_workers)
+    try:
+        if args.warmup:
+            print(f"🔥 Warming up for {args.warmup}s...")
+            drive(port, args.mix, sizes, args.concurrency, args.warmup, args.seed)
+        print(f"🚀 {args.concurrency} clients for {args.duration}s...")
+        samples = drive(
+            port, args.mix, sizes, args.concurrency, args.duration, args.seed + 1000
+        )
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "config": {
+            "transactions": args.transactions,
+            "products": args.products,
+            "customers": args.customers,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "server_workers": args.server_workers,
+            "mix": args.mix,
+            "db_mode": os.getenv("DB_MODE", "sync"),
+        },
+        "endpoints": summarize(samples, args.duration),
+    }
+    print_table(results["endpoints"])
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n📄 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print("\n⚠️ The baseline was recorded with a different config.")
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
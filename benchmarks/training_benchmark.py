@@ -0,0 +1,327 @@
+"""
+Training pipeline benchmark: wall time per stage, peak RSS and model
+artifact size for each training pipeline at growing dataset sizes.
+
+    forecasting  ml-engine/train_forecasting.py
+    clustering   ml-engine/train_clustering.py
+    retrain      backend/training.py retrain_models_task (the API's job)
+
+Each (pipeline, size) runs in a fresh subprocess so its peak RSS is its
+own. Datasets are generated once per size and cached in --workdir.
+Results are appended to --history (default
+benchmarks/results/training_history.jsonl, git-ignored: timings are
+per machine) and compared with the previous run of the same pipeline and
+size:
+
+    python benchmarks/training_benchmark.py --sizes 10k,100k,1M,10M \\
+        --window-minutes 60
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BACKEND_DIR = os.path.join(ROOT, "backend")
+ML_ENGINE_DIR = os.path.join(ROOT, "ml-engine")
+DATA_DIR = os.path.join(ROOT, "data")
+HISTORY_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "results", "training_history.jsonl"
+)
+
+PIPELINES = ["forecasting", "clustering", "retrain"]
+DEFAULT_SIZES = "10k,100k,1M,10M"
+EXTRAPOLATE_MAX = 100  # Don't trust the scaling curve further than this
+
+# Stage -> words its progress message starts with
+STAGES = {
+    "load": ("Loading",),
+    "features": ("Engineering",),
+    "fit": ("Fitting",),
+    "evaluate": ("Evaluating",),
+    "serialize": ("Saving", "Publishing"),
+    "refresh": ("Refreshing",),
+}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    factor = {"k": 1_000, "m": 1_000_000}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def stage_of(message: str) -> str:
+    for stage, words in STAGES.items():
+        if message.startswith(words):
+            return stage
+    return message
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+# --- ONE RUN (child process) ---
+
+
+def run_one(pipeline: str, model_dir: str) -> dict:
+    """Runs one pipeline in this process; returns its measurements."""
+    marks = []
+
+    def progress(fraction: float, message: str):
+        marks.append((time.perf_counter(), stage_of(message)))
+
+    os.makedirs(model_dir, exist_ok=True)
+    os.chdir(model_dir)  # The ml-engine scripts save next to the cwd
+
+    if pipeline == "forecasting":
+        sys.path.append(ML_ENGINE_DIR)
+        from train_forecasting import train_forecasting_model as train
+    elif pipeline == "clustering":
+        sys.path.append(ML_ENGINE_DIR)
+        from train_clustering import train_segmentation_model as train
+    else:
+        sys.path.append(BACKEND_DIR)
+        from training import retrain_models_task as train
+
+    # Timed after the imports: pandas/sklearn/app start-up is not training
+    started = time.perf_counter()
+    train(progress=progress)
+    finished = time.perf_counter()
+
+    stages = {}
+    ends = [t for t, _ in marks[1:]] + [finished]
+    for (begin, stage), end in zip(marks, ends):
+        stages[stage] = round(stages.get(stage, 0.0) + end - begin, 3)
+
+    artifacts = 0
+    for folder, _, files in os.walk(model_dir):
+        artifacts += sum(
+            os.path.getsize(os.path.join(folder, f))
+            for f in files
+            if f.endswith(".pkl")
+        )
+
+    return {
+        "total_s": round(finished - started, 3),
+        "stages_s": stages,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "artifact_bytes": artifacts,
+    }
+
+
+# --- ORCHESTRATION ---
+
+
+def prepare(size: int, args) -> dict:
+    """Cached dataset + SQLite DB for `size` transactions; returns the env."""
+    root = os.path.join(args.workdir, f"{size}")
+    data_dir = os.path.join(root, "data")
+    db_path = os.path.join(root, "bench.db")
+    env = dict(
+        os.environ,
+        DATASET_DIR=data_dir,
+        DATABASE_URL=f"sqlite:///{db_path}",
+        RETRAIN_WORKER="external",
+    )
+
+    if not os.path.exists(db_path):
+        print(f"🌱 Generating {size:,} transactions...", flush=True)
+        os.makedirs(data_dir, exist_ok=True)
+        sys.path.append(DATA_DIR)
+        from generate_data import generate_data
+
+        generate_data(
+            size, args.products, args.customers, seed=args.seed, data_dir=data_dir
+        )
+        subprocess.run(
+            [sys.executable, "init_db.py", "--data-dir", data_dir],
+            cwd=BACKEND_DIR,
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+    return env
+
+
+def measure(pipeline: str, size: int, env: dict, args) -> dict:
+    model_dir = os.path.join(args.workdir, f"{size}", "models", pipeline)
+    env = dict(env, MODEL_DIR=model_dir)
+    shutil.rmtree(model_dir, ignore_errors=True)  # Artifacts of this run only
+    child = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-one", pipeline]
+        + ["--model-dir", model_dir],
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=args.timeout,
+    )
+    if child.returncode != 0:
+        return {"error": child.stderr.strip().splitlines()[-1:]}
+    # The measurements are the child's last stdout line
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def load_history(path: str) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_result(history: list, pipeline: str, size: int):
+    for record in reversed(history):
+        for row in record["results"]:
+            if row["pipeline"] == pipeline and row["transactions"] == size:
+                if "total_s" in row:
+                    return record["commit"], row
+    return None, None
+
+
+def size_for_window(rows: list, window_s: float):
+    """
+    Extrapolates (log-log fit of total time vs size) the dataset size at
+    which a pipeline takes `window_s`. None with fewer than 2 points.
+    """
+    points = [(r["transactions"], r["total_s"]) for r in rows if "total_s" in r]
+    if len(points) < 2:
+        return None
+    sizes, seconds = np.log([p[0] for p in points]), np.log([p[1] for p in points])
+    slope, intercept = np.polyfit(sizes, seconds, 1)
+    if slope <= 0:
+        return None
+    return int(np.exp((np.log(window_s) - intercept) / slope))
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_row(row: dict, previous):
+    if "total_s" not in row:
+        print(f"{row['pipeline']:<12}{row['transactions']:>11,}  ❌ {row['error']}")
+        return
+
+    stages = " ".join(f"{k}={v:.2f}" for k, v in row["stages_s"].items())
+    change = ""
+    if previous is not None:
+        delta = (row["total_s"] / max(previous["total_s"], 1e-9) - 1) * 100
+        change = f" ({delta:+.0f}% vs previous)"
+    print(
+        f"{row['pipeline']:<12}{row['transactions']:>11,}{row['total_s']:>9.2f}s"
+        f"{row['peak_rss_mb']:>9.0f}MB{row['artifact_bytes'] / 1e6:>8.2f}MB"
+        f"{change}\n{'':<23}{stages}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the training pipelines.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="e.g. 10k,100k,1M")
+    parser.add_argument(
+        "--pipelines", default=",".join(PIPELINES), help="Comma-separated."
+    )
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--customers", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--workdir",
+        default=os.path.join(os.path.expanduser("~"), ".cache", "optistock-bench"),
+        help="Generated datasets are cached here between runs.",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=4 * 3600, help="Per run, seconds."
+    )
+    parser.add_argument(
+        "--window-minutes",
+        type=float,
+        help="Nightly window: report the dataset size each pipeline fits in.",
+    )
+    parser.add_argument(
+        "--history",
+        default=HISTORY_PATH,
+        help="JSONL file runs are appended to and compared with (not versioned).",
+    )
+    parser.add_argument("--no-history", action="store_true")
+    parser.add_argument("--run-one", choices=PIPELINES, help=argparse.SUPPRESS)
+    parser.add_argument("--model-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        result = run_one(args.run_one, args.model_dir)
+        print(json.dumps(result))
+        return
+
+    sizes = [parse_size(s) for s in args.sizes.split(",")]
+    pipelines = [p.strip() for p in args.pipelines.split(",")]
+    history = load_history(args.history)
+    results = []
+
+    print(f"{'pipeline':<12}{'rows':>11}{'total':>10}{'peak':>11}{'model':>10}")
+    for size in sizes:
+        env = prepare(size, args)
+        for pipeline in pipelines:
+            row = {"pipeline": pipeline, "transactions": size}
+            row.update(measure(pipeline, size, env, args))
+            results.append(row)
+            print_row(row, previous_result(history, pipeline, size)[1])
+
+    if args.window_minutes:
+        window_s = args.window_minutes * 60
+        print(f"\n⏱️  Nightly window: {args.window_minutes:g} min")
+        for pipeline in pipelines:
+            rows = [r for r in results if r["pipeline"] == pipeline]
+            fits = [
+                r["transactions"] for r in rows if r.get("total_s", 1e18) <= window_s
+            ]
+            limit = size_for_window(rows, window_s)
+            if limit is None:
+                estimate = "n/a"
+            elif limit > EXTRAPOLATE_MAX * max(sizes):
+                estimate = f"beyond {EXTRAPOLATE_MAX}x the largest size measured"
+            else:
+                estimate = f"~{limit:,} rows"
+            print(
+                f"   {pipeline:<12} largest measured fit: "
+                f"{max(fits) if fits else 0:,} rows; extrapolated limit: {estimate}"
+            )
+
+    if not args.no_history:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        record = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "host": {
+                "machine": platform.machine(),
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+            },
+            "config": {"products": args.products, "customers": args.customers},
+            "results": results,
+        }
+        with open(args.history, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\n📄 Appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
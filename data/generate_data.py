@@ -1,114 +1,167 @@
+import argparse
+import time
+
 import pandas as pd
 import numpy as np
-from faker import Faker
-import random
-from datetime import datetime, timedelta
 
-# Initialize Faker
-fake = Faker()
-np.random.seed(42)  # For reproducibility
+from optistock.dataset import DATA_DIR, append_table, drop_table, write_table
+
+CATEGORIES = ["Electronics", "Clothing", "Home", "Groceries"]
+
+# Hidden customer segments (the ML model has to guess them!)
+# Segment 0: Budget (Low spenders)
+# Segment 1: Regular (Average)
+# Segment 2: VIP (High spenders, frequent buyers)
+SEGMENT_SHARE = [0.5, 0.3, 0.2]
+MAX_QUANTITY = np.array([2, 3, 5])  # Per segment: VIPs buy more
+
+HOLIDAY_MONTHS = [11, 12]
+HOLIDAY_DEMAND = 1.5  # Seasonality: more sales in Nov/Dec...
+HOLIDAY_MARKUP = 1.1  # ...at slightly higher prices (demand pricing)
+WEEKEND_DEMAND = 1.2
+
+
+def make_products(rng, n_products: int) -> pd.DataFrame:
+    ids = np.arange(1, n_products + 1)
+    return pd.DataFrame(
+        {
+            "id": ids,
+            "name": [f"Product_{i}" for i in ids],
+            "category": rng.choice(CATEGORIES, size=n_products),
+            "base_price": np.round(rng.uniform(10, 500, size=n_products), 2),
+            "stock": rng.integers(0, 100, size=n_products),  # Mock current stock
+        }
+    )
+
+
+def make_customers(rng, n_customers: int):
+    """(customers table, hidden segment per customer)."""
+    ids = np.arange(1, n_customers + 1)
+    customers = pd.DataFrame({"id": ids})
+    customers["name"] = "Customer " + customers["id"].astype(str)
+    customers["email"] = "user" + customers["id"].astype(str) + "@example.com"
+    segments = rng.choice(3, size=n_customers, p=SEGMENT_SHARE)
+    return customers, segments
+
+
+def day_weights(days: pd.DatetimeIndex) -> np.ndarray:
+    """Relative sales volume of each calendar day (holidays, weekends)."""
+    weights = np.ones(len(days))
+    weights[days.month.isin(HOLIDAY_MONTHS)] *= HOLIDAY_DEMAND
+    weights[days.dayofweek >= 5] *= WEEKEND_DEMAND
+    return weights / weights.sum()
+
+
+def product_weights(base_price: np.ndarray) -> list:
+    """Product pick probabilities per segment."""
+    return [
+        (1 / base_price) / (1 / base_price).sum(),  # Budget: prefer cheap
+        np.full(len(base_price), 1 / len(base_price)),  # Regular: any
+        base_price / base_price.sum(),  # VIP: prefer expensive
+    ]
+
 
+def make_transactions(rng, size, first_id, segments, base_price, days, weights):
+    """One chunk of `size` transactions, every column drawn as a whole array."""
+    customer = rng.integers(0, len(segments), size=size)
+    segment = segments[customer]
 
-def generate_data():
+    product = np.empty(size, dtype=np.int64)
+    for seg, p in enumerate(product_weights(base_price)):
+        rows = segment == seg
+        product[rows] = rng.choice(len(base_price), size=rows.sum(), p=p)
+
+    quantity = rng.integers(1, MAX_QUANTITY[segment] + 1)
+
+    day = days[rng.choice(len(days), size=size, p=weights)]
+    seconds = rng.integers(8 * 3600, 20 * 3600, size=size)  # Opening hours
+    date = day + pd.to_timedelta(seconds, unit="s")
+
+    price = base_price[product] * np.where(
+        date.month.isin(HOLIDAY_MONTHS), HOLIDAY_MARKUP, 1.0
+    )
+
+    chunk = pd.DataFrame(
+        {
+            "customer_id": customer + 1,
+            "product_id": product + 1,
+            "date": date,
+            "quantity": quantity,
+            "total_amount": np.round(price * quantity, 2),
+        }
+    )
+    # Sort by date for Time Series forecasting later
+    chunk = chunk.sort_values("date", kind="stable", ignore_index=True)
+    chunk.insert(0, "id", np.arange(first_id, first_id + size))
+    return chunk
+
+
+def generate_data(
+    n_transactions: int = 10000,
+    n_products: int = 50,
+    n_customers: int = 1000,
+    days: int = 365,
+    seed: int = 42,
+    chunk_rows: int = 1_000_000,
+    data_dir: str = DATA_DIR,
+):
     print("Generating OptiStock Synthetic Data...")
+    rng = np.random.default_rng(seed)  # For reproducibility
 
     # --- 1. PRODUCTS (The Inventory) ---
     print("1. Creating Products...")
-    categories = ["Electronics", "Clothing", "Home", "Groceries"]
-    products = []
-    for i in range(1, 51):  # 50 Products
-        cat = random.choice(categories)
-        base_price = round(random.uniform(10, 500), 2)
-        products.append(
-            {
-                "product_id": i,
-                "product_name": f"Product_{i}",
-                "category": cat,
-                "base_price": base_price,
-            }
-        )
-    df_products = pd.DataFrame(products)
-    df_products.to_csv("products.csv", index=False)
-    print("   -> Saved products.csv")
+    products = make_products(rng, n_products)
+    write_table(products, "products", data_dir)
+    print(f"   -> Saved {len(products)} products")
 
     # --- 2. CUSTOMERS (The Users) ---
     print("2. Creating Customers with Hidden Patterns...")
-    customers = []
-    for i in range(1, 1001):  # 1000 Customers
-        # Assign a "Hidden Segment" to mimic real life
-        # Segment 0: Budget (Low spenders)
-        # Segment 1: Regular (Average)
-        # Segment 2: VIP (High spenders, frequent buyers)
-        segment = np.random.choice([0, 1, 2], p=[0.5, 0.3, 0.2])
-
-        customers.append(
-            {
-                "customer_id": i,
-                "name": fake.name(),
-                "email": fake.email(),
-                "join_date": fake.date_between(start_date="-2y", end_date="today"),
-                "segment_type": segment,  # We won't give this to the ML model! It has to guess it.
-            }
-        )
-    df_customers = pd.DataFrame(customers)
-    df_customers.to_csv("customers.csv", index=False)
-    print("   -> Saved customers.csv")
+    customers, segments = make_customers(rng, n_customers)
+    write_table(customers, "customers", data_dir)
+    print(f"   -> Saved {len(customers)} customers")
 
     # --- 3. TRANSACTIONS (The History) ---
-    print("3. Generating Sales History (This may take a moment)...")
-    transactions = []
-    start_date = datetime.now() - timedelta(days=365)  # 1 year of data
-
-    for _ in range(10000):  # 10,000 Transactions
-        # Pick a random customer
-        cust = df_customers.sample(1).iloc[0]
-        cust_id = cust["customer_id"]
-        segment = cust["segment_type"]
-
-        # Logic: VIPs buy more expensive stuff and buy more often
-        if segment == 2:  # VIP
-            prod = df_products.sample(1, weights=df_products["base_price"]).iloc[
-                0
-            ]  # Prefer expensive
-            qty = random.randint(1, 5)
-        elif segment == 0:  # Budget
-            prod = df_products.sample(1, weights=1 / df_products["base_price"]).iloc[
-                0
-            ]  # Prefer cheap
-            qty = random.randint(1, 2)
-        else:  # Regular
-            prod = df_products.sample(1).iloc[0]
-            qty = random.randint(1, 3)
-
-        # Logic: Seasonality (More sales in Dec/Nov)
-        txn_date = start_date + timedelta(days=random.randint(0, 365))
-        is_weekend = txn_date.weekday() >= 5
-        is_holiday = txn_date.month in [11, 12]
-
-        # Adjust price slightly based on date (Demand pricing)
-        final_price = prod["base_price"]
-        if is_holiday:
-            final_price *= 1.1  # Higher prices in holiday
-
-        transactions.append(
-            {
-                "date": txn_date.strftime("%Y-%m-%d"),
-                "customer_id": cust_id,
-                "product_id": prod["product_id"],
-                "category": prod["category"],
-                "quantity": qty,
-                "unit_price": round(final_price, 2),
-                "total_amount": round(final_price * qty, 2),
-            }
+    print(f"3. Generating {n_transactions:,} Transactions...")
+    end = pd.Timestamp.today().normalize()
+    calendar = pd.date_range(end - pd.Timedelta(days=days), end, freq="D")
+    weights = day_weights(calendar)
+    base_price = products["base_price"].to_numpy()
+
+    drop_table("transactions", data_dir)
+    started = time.perf_counter()
+    for first in range(0, n_transactions, chunk_rows):
+        size = min(chunk_rows, n_transactions - first)
+        chunk = make_transactions(
+            rng, size, first + 1, segments, base_price, calendar, weights
         )
+        append_table(chunk, "transactions", data_dir)
+
+        done = first + size
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        print(f"   ... {done:,} rows ({rate:,.0f} rows/s)", flush=True)
 
-    df_transactions = pd.DataFrame(transactions)
-    # Sort by date for Time Series forecasting later
-    df_transactions = df_transactions.sort_values(by="date")
-    df_transactions.to_csv("transactions.csv", index=False)
-    print("   -> Saved transactions.csv")
     print("Done! Data environment ready.")
 
 
 if __name__ == "__main__":
-    generate_data()
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic dataset in the schema init_db.py loads."
+    )
+    parser.add_argument("--transactions", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--customers", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365, help="History length.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    args = parser.parse_args()
+
+    generate_data(
+        args.transactions,
+        args.products,
+        args.customers,
+        args.days,
+        args.seed,
+        args.chunk_rows,
+        args.data_dir,
+    )
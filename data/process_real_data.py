@@ -1,62 +1,184 @@
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
 
+from optistock.dataset import write_table
+
+SOURCE_PATH = "data/source_data.csv"
+CHUNK_ROWS = 200_000
+KEEP_TRANSACTIONS = 50000  # Recent transactions kept to keep free tier fast
+
+# Only the columns we use, with explicit dtypes (no per-chunk type inference)
+SOURCE_COLUMNS = {
+    "StockCode": "string",
+    "Description": "string",
+    "Quantity": "float64",
+    "InvoiceDate": "string",
+    "Price": "float64",
+    "Customer ID": "float64",
+}
+
+# Lookup tables for the mapping stage, set once per worker process
+_PRODUCT_CODES = None
+_CUSTOMER_CODES = None
+
+
+def read_source(path: str, chunk_rows: int):
+    """Streams the source CSV (encoding handles currency symbols)."""
+    return pd.read_csv(
+        path,
+        encoding="ISO-8859-1",
+        usecols=list(SOURCE_COLUMNS),
+        dtype=SOURCE_COLUMNS,
+        engine="c",
+        chunksize=chunk_rows,
+    )
 
-def process_data():
-    print("🔄 Loading Real Data (this might take a moment)...")
-    # Load the dataset (Ensure encoding handles currency symbols)
-    try:
-        df = pd.read_csv("data/source_data.csv", encoding="ISO-8859-1")
-    except FileNotFoundError:
-        print("❌ Error: 'source_data.csv' not found. Please download it first.")
-        return
-
-    print(f"   Raw Rows: {len(df)}")
 
-    # --- 1. CLEANING ---
+def clean_chunk(df: pd.DataFrame) -> pd.DataFrame:
     # Drop rows with missing Customer ID
     df = df.dropna(subset=["Customer ID"])
 
     # Remove "Returns" (Negative Quantity) and Bad Prices
-    df = df[(df["Quantity"] > 0) & (df["Price"] > 0)]
+    return df[(df["Quantity"] > 0) & (df["Price"] > 0)]
+
+
+def summarize_chunk(df: pd.DataFrame) -> dict:
+    """
+    Stage 1: per-chunk partial aggregates, merged in chunk order.
+    Sums and counts merge exactly, so the result does not depend on
+    how the file was chunked or which process handled a chunk.
+    """
+    df = clean_chunk(df)
+    return {
+        "rows": len(df),
+        "descriptions": df.groupby(["StockCode", "Description"]).size(),
+        "price_sum": df.groupby("StockCode")["Price"].sum(),
+        "price_count": df.groupby("StockCode")["Price"].count(),
+        "customers": pd.unique(df["Customer ID"]),  # In order of appearance
+    }
+
+
+def _set_maps(product_codes, customer_codes):
+    global _PRODUCT_CODES, _CUSTOMER_CODES
+    _PRODUCT_CODES = product_codes
+    _CUSTOMER_CODES = customer_codes
+
+
+def map_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Stage 2: cleaned rows with integer product/customer ids (vectorized)."""
+    df = clean_chunk(df)
+
+    # Ids are 1-based positions in the lookup indexes; -1 means not found
+    transactions = pd.DataFrame(
+        {
+            "customer_id": _CUSTOMER_CODES.get_indexer(df["Customer ID"]) + 1,
+            "product_id": _PRODUCT_CODES.get_indexer(df["StockCode"]) + 1,
+            "date": pd.to_datetime(df["InvoiceDate"]).to_numpy(),
+            "quantity": df["Quantity"].astype(int).to_numpy(),
+        }
+    )
+    transactions["total_amount"] = transactions["quantity"] * df["Price"].to_numpy()
+
+    # Drop rows where mapping failed (e.g. missing StockCode)
+    mapped = (transactions["product_id"] > 0) & (transactions["customer_id"] > 0)
+    return transactions[mapped.to_numpy()].reset_index(drop=True)
+
+
+def run_stage(fn, chunks, workers: int, initargs=()):
+    """
+    Applies `fn` to every chunk and yields results in chunk order.
+    With workers > 1 chunks run in a process pool; at most 2 chunks per
+    worker are in flight, so memory stays bounded on huge files.
+    """
+    if workers <= 1:
+        if initargs:
+            _set_maps(*initargs)
+        for chunk in chunks:
+            yield fn(chunk)
+        return
 
-    # Convert Date
-    df["InvoiceDate"] = pd.to_datetime(df["InvoiceDate"])
+    initializer = _set_maps if initargs else None
+    with ProcessPoolExecutor(
+        workers, initializer=initializer, initargs=initargs
+    ) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(fn, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def modal_descriptions(counts: pd.Series, codes: pd.Index) -> pd.Series:
+    """
+    Most frequent Description per StockCode (ties -> alphabetically first,
+    like Series.mode()[0]) via one sort over the value counts.
+    """
+    counts = counts.rename("n").reset_index()
+    counts = counts.sort_values(
+        ["StockCode", "n", "Description"], ascending=[True, False, True]
+    )
+    best = counts.drop_duplicates("StockCode").set_index("StockCode")["Description"]
+    return best.reindex(codes).fillna("Unknown")
+
+
+def process_data(
+    source_path: str = SOURCE_PATH, chunk_rows: int = CHUNK_ROWS, workers: int = 1
+):
+    print("🔄 Loading Real Data (streaming in chunks)...")
+    if not os.path.exists(source_path):
+        print("❌ Error: 'source_data.csv' not found. Please download it first.")
+        return
 
-    print(f"   Cleaned Rows: {len(df)}")
+    # --- 1. SUMMARIZE (cleaning + partial aggregates per chunk) ---
+    raw_rows = 0
+    cleaned_rows = 0
+    descriptions = []
+    price_sum = pd.Series(dtype="float64")
+    price_count = pd.Series(dtype="float64")
+    customer_codes = pd.Index([], dtype="float64")
+
+    def counted(chunks):
+        nonlocal raw_rows
+        for chunk in chunks:
+            raw_rows += len(chunk)
+            yield chunk
+
+    for part in run_stage(
+        summarize_chunk, counted(read_source(source_path, chunk_rows)), workers
+    ):
+        cleaned_rows += part["rows"]
+        descriptions.append(part["descriptions"])
+        price_sum = price_sum.add(part["price_sum"], fill_value=0)
+        price_count = price_count.add(part["price_count"], fill_value=0)
+
+        # Customer id map grows incrementally, in order of first appearance
+        new = pd.Index(part["customers"])
+        customer_codes = customer_codes.append(new[customer_codes.get_indexer(new) < 0])
+
+    print(f"   Raw Rows: {raw_rows}")
+    print(f"   Cleaned Rows: {cleaned_rows}")
 
     # --- 2. GENERATE PRODUCTS.CSV ---
     print("📦 Extracting Products...")
-    # Group by StockCode to find unique products
-    products = (
-        df.groupby("StockCode")
-        .agg(
-            {
-                "Description": lambda x: (
-                    x.mode()[0] if not x.mode().empty else "Unknown"
-                ),
-                "Price": "mean",  # Average price over time
-            }
-        )
-        .reset_index()
+    # Sorted StockCodes (Dataset uses Strings like '85123A') -> numeric ids 1..n
+    product_codes = price_sum.index.sort_values()
+    products = pd.DataFrame({"id": np.arange(1, len(product_codes) + 1)})
+
+    counts = pd.concat(descriptions).groupby(level=[0, 1]).sum()
+    products["name"] = modal_descriptions(counts, product_codes).to_numpy()
+    products["base_price"] = (
+        (price_sum / price_count)  # Average price over time
+        .reindex(product_codes)
+        .to_numpy()
     )
 
-    # Rename columns to match our Schema
-    products = products.rename(
-        columns={
-            "StockCode": "id",  # We will map string IDs to Ints later if needed
-            "Description": "name",
-            "Price": "base_price",
-        }
-    )
-
-    # Create numeric IDs for Products (Our DB uses Integers, Dataset uses Strings like '85123A')
-    products["original_id"] = products["id"]
-    products["id"] = range(1, len(products) + 1)
-
-    # Create a mapping dictionary for later
-    id_map = dict(zip(products["original_id"], products["id"]))
-
     # Add fake categories (Dataset doesn't have them)
     categories = ["Home", "Gift", "Office", "Decor", "Kitchen"]
     products["category"] = np.random.choice(categories, size=len(products))
@@ -65,54 +187,64 @@ def process_data():
     )  # Mock current stock
 
     # Save
-    products[["id", "name", "category", "base_price", "stock"]].to_csv(
-        "data/products.csv", index=False
-    )
+    write_table(products[["id", "name", "category", "base_price", "stock"]], "products")
     print(f"   -> Saved {len(products)} products.")
 
     # --- 3. GENERATE CUSTOMERS.CSV ---
     print("bust Extracting Customers...")
-    unique_customers = df["Customer ID"].unique()
-    customers = pd.DataFrame(unique_customers, columns=["original_id"])
-
-    # Create Numeric IDs
-    customers["id"] = range(1, len(customers) + 1)
-    cust_map = dict(zip(customers["original_id"], customers["id"]))
-
-    customers["name"] = [f"Customer {i}" for i in customers["id"]]
-    customers["email"] = [f"user{i}@example.com" for i in customers["id"]]
+    customers = pd.DataFrame({"id": np.arange(1, len(customer_codes) + 1)})
+    customers["name"] = "Customer " + customers["id"].astype(str)
+    customers["email"] = "user" + customers["id"].astype(str) + "@example.com"
 
     # Save
-    customers[["id", "name", "email"]].to_csv("data/customers.csv", index=False)
+    write_table(customers[["id", "name", "email"]], "customers")
     print(f"   -> Saved {len(customers)} customers.")
 
     # --- 4. GENERATE TRANSACTIONS.CSV ---
     print("💳 Extracting Transactions...")
-    # Map IDs
-    df["product_id"] = df["StockCode"].map(id_map)
-    df["customer_id"] = df["Customer ID"].map(cust_map)
-
-    # Rename and Select
-    transactions = df.rename(columns={"InvoiceDate": "date", "Quantity": "quantity"})
-
-    # Calculate Total Amount
-    transactions["total_amount"] = transactions["quantity"] * transactions["Price"]
-
-    # Drop rows where mapping failed
-    transactions = transactions.dropna(subset=["product_id", "customer_id"])
-    transactions["product_id"] = transactions["product_id"].astype(int)
-    transactions["customer_id"] = transactions["customer_id"].astype(int)
-    transactions["id"] = range(1, len(transactions) + 1)
+    # Second pass: map ids, keep only the most recent KEEP_TRANSACTIONS
+    recent = None
+    next_id = 1
+    for transactions in run_stage(
+        map_chunk,
+        read_source(source_path, chunk_rows),
+        workers,
+        initargs=(product_codes, customer_codes),
+    ):
+        transactions["id"] = np.arange(next_id, next_id + len(transactions))
+        next_id += len(transactions)
+
+        recent = (
+            pd.concat([recent, transactions]) if recent is not None else transactions
+        )
+        recent = recent.sort_values("date", kind="stable").tail(KEEP_TRANSACTIONS)
 
-    # Save (Limit to recent 50k transactions to keep free tier fast)
-    transactions = transactions.sort_values("date").tail(50000)
+    if recent is None:
+        recent = pd.DataFrame(
+            columns=["id", "customer_id", "product_id", "date", "quantity"]
+            + ["total_amount"]
+        )
 
-    transactions[
-        ["id", "customer_id", "product_id", "date", "quantity", "total_amount"]
-    ].to_csv("data/transactions.csv", index=False)
-    print(f"   -> Saved {len(transactions)} transactions.")
+    write_table(
+        recent[["id", "customer_id", "product_id", "date", "quantity", "total_amount"]],
+        "transactions",
+    )
+    print(f"   -> Saved {len(recent)} transactions.")
     print("✅ DATA PROCESSING COMPLETE.")
 
 
 if __name__ == "__main__":
-    process_data()
+    parser = argparse.ArgumentParser(
+        description="Build products/customers/transactions CSVs from the retail export."
+    )
+    parser.add_argument("--source", default=SOURCE_PATH)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes for the per-chunk stages (1 = run in this process).",
+    )
+    args = parser.parse_args()
+
+    process_data(args.source, args.chunk_rows, args.workers)
@@ -3,29 +3,33 @@ from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import silhouette_score
 import pickle
-import os
+
+from optistock.dataset import DATA_DIR, exists, read_table  # Parquet or CSV
 
 # CONFIG
-DATA_PATH = "../data/transactions.csv"  # <--- READING CSV DIRECTLY
 MODEL_PATH = "kmeans_model.pkl"
 SCALER_PATH = "scaler.pkl"
 META_PATH = "model_metadata.pkl"
 
-def train_segmentation_model():
+def _no_progress(fraction, message):
+    pass
+
+def train_segmentation_model(progress=_no_progress):
+    """`progress(fraction, message)` is called as each stage starts."""
     print("Starting Customer Segmentation Training...")
     
     # 1. Load Data
-    if not os.path.exists(DATA_PATH):
-        raise FileNotFoundError(f"Data not found at {DATA_PATH}. Did you run process_real_data.py?")
-    
-    print(f"Loading data from {DATA_PATH}...")
-    df = pd.read_csv(DATA_PATH)
+    if not exists('transactions'):
+        raise FileNotFoundError(f"Data not found in {DATA_DIR}. Did you run process_real_data.py?")
     
-    # Convert date column
-    df['date'] = pd.to_datetime(df['date'])
+    print(f"Loading transactions from {DATA_DIR}...")
+    progress(0.0, "Loading data")
+    # Only the RFM columns; dates come back already parsed
+    df = read_table('transactions', columns=['id', 'customer_id', 'date', 'total_amount'])
 
     # 2. Feature Engineering (RFM)
     print("Calculating RFM metrics...")
+    progress(0.2, "Engineering features")
     
     # Snapshot date is the day after the last transaction
     snapshot_date = df['date'].max() + pd.Timedelta(days=1)
@@ -43,6 +47,7 @@ def train_segmentation_model():
 
     # 3. Scaling
     print("Scaling features...")
+    progress(0.4, "Fitting model")
     scaler = StandardScaler()
     scaled_data = scaler.fit_transform(rfm)
 
@@ -55,6 +60,7 @@ def train_segmentation_model():
     rfm['Cluster'] = clusters
     
     # Evaluate
+    progress(0.8, "Evaluating model")
     score = silhouette_score(scaled_data, clusters)
     print(f" -> Model Silhouette Score: {score:.2f} (Good if > 0.5)")
 
@@ -66,6 +72,7 @@ def train_segmentation_model():
 
     # 6. Save Models
     print("Saving models...")
+    progress(0.9, "Saving models")
     with open(MODEL_PATH, "wb") as f:
         pickle.dump(kmeans, f)
     with open(SCALER_PATH, "wb") as f:
@@ -1,93 +1,63 @@
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import GradientBoostingRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import mean_squared_error
+import argparse
 import pickle
-import os
+
+from optistock.dataset import exists, read_table  # Parquet (month-partitioned) or CSV
+from optistock.features import FEATURE_COLUMNS, daily_sales, training_rows
 
 # CONFIG
-TRANS_PATH = "../data/transactions.csv"
-PROD_PATH = "../data/products.csv"
 MODEL_PATH = "forecast_model.pkl"
 ENCODER_PATH = "category_encoder.pkl"
 
 
-def train_forecasting_model():
+def _no_progress(fraction: float, message: str):
+    pass
+
+
+def train_forecasting_model(since=None, progress=_no_progress):
+    """`progress(fraction, message)` is called as each stage starts."""
     print("Starting Demand Forecasting Training...")
 
-    # 1. Load Data
-    if not os.path.exists(TRANS_PATH) or not os.path.exists(PROD_PATH):
+    # 1. Load Data (only the columns, and months, the features need)
+    if not exists("transactions") or not exists("products"):
         raise FileNotFoundError("Data files not found. Run process_real_data.py first.")
 
-    transactions = pd.read_csv(TRANS_PATH)
-    products = pd.read_csv(PROD_PATH)
-
-    # Merge to get Product Details (Category, Price)
-    df = transactions.merge(
-        products[["id", "category", "base_price"]],
-        left_on="product_id",
-        right_on="id",
-        how="left",
+    progress(0.0, "Loading data")
+    transactions = read_table(
+        "transactions", columns=["product_id", "date", "quantity"], start=since
     )
-    df["date"] = pd.to_datetime(df["date"])
+    products = read_table("products", columns=["id", "category", "base_price"])
 
-    # 2. Feature Engineering
+    # 2. Feature Engineering (shared with the API, see optistock/features.py)
     print("Engineering features (Lags & Rolling Means)...")
+    progress(0.2, "Engineering features")
 
-    # Aggregate daily sales per product
-    daily_sales = (
-        df.groupby(["product_id", "date", "category", "base_price"])["quantity"]
-        .sum()
-        .reset_index()
+    # Aggregate daily sales per product, then lags on a calendar-complete series
+    daily = daily_sales(transactions, date_col="date")
+    data = training_rows(daily).merge(
+        products[["id", "category", "base_price"]],
+        left_on="product_id",
+        right_on="id",
+        how="inner",  # Sales of products no longer in the catalog are dropped
     )
 
-    # Sort for Time Series calc
-    daily_sales = daily_sales.sort_values(["product_id", "date"])
-
-    # Create Features
-    daily_sales["day_of_week"] = daily_sales["date"].dt.dayofweek
-    daily_sales["month"] = daily_sales["date"].dt.month
-
-    # Lag Features (Past Sales)
-    daily_sales["lag_1"] = daily_sales.groupby("product_id")["quantity"].shift(
-        1
-    )  # Sales yesterday
-    daily_sales["lag_7"] = daily_sales.groupby("product_id")["quantity"].shift(
-        7
-    )  # Sales last week
-
-    # Rolling Mean (Moving Average of last 3 days)
-    daily_sales["rolling_mean_3"] = daily_sales.groupby("product_id")[
-        "quantity"
-    ].transform(lambda x: x.rolling(window=3).mean())
-
-    # Drop NaN values created by lags (the first 7 days of data have no history)
-    data = daily_sales.dropna()
-
     # Encode Category (String -> Number)
     le = LabelEncoder()
     data["category_encoded"] = le.fit_transform(data["category"].astype(str))
 
     # Define Input (X) and Output (y)
-    features = [
-        "product_id",
-        "base_price",
-        "category_encoded",
-        "day_of_week",
-        "month",
-        "lag_1",
-        "lag_7",
-        "rolling_mean_3",
-    ]
     target = "quantity"
 
-    X = data[features]
+    X = data[FEATURE_COLUMNS]
     y = data[target]
 
     # 3. Train Model
     print(f"Training on {len(X)} rows...")
+    progress(0.4, f"Fitting model on {len(X)} rows")
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42
     )
@@ -98,12 +68,14 @@ def train_forecasting_model():
     model.fit(X_train, y_train)
 
     # 4. Evaluate
+    progress(0.8, "Evaluating model")
     predictions = model.predict(X_test)
     rmse = np.sqrt(mean_squared_error(y_test, predictions))
     print(f" -> Model RMSE: {rmse:.2f} (Lower is better)")
 
     # 5. Save
     print("Saving models...")
+    progress(0.9, "Saving models")
     with open(MODEL_PATH, "wb") as f:
         pickle.dump(model, f)
     with open(ENCODER_PATH, "wb") as f:
@@ -113,4 +85,10 @@ def train_forecasting_model():
 
 
 if __name__ == "__main__":
-    train_forecasting_model()
+    parser = argparse.ArgumentParser(description="Train the demand forecast model.")
+    parser.add_argument(
+        "--since", help="Only train on sales from this date on (YYYY-MM-DD)."
+    )
+    args = parser.parse_args()
+
+    train_forecasting_model(args.since)
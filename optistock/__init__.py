@@ -0,0 +1,6 @@
+"""
+Code shared by the backend, the ml-engine training scripts and the data
+pipeline: feature engineering and the on-disk dataset reader/writer. Install it once from the repo root:
+
+    pip install -e .
+"""
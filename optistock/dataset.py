@@ -0,0 +1,199 @@
+"""
+On-disk dataset shared by the pipeline stages.
+
+data/process_real_data.py / fetch_live_data.py write it; backend/init_db.py
+and the ml-engine training scripts read it. With pyarrow installed tables are
+Parquet, and transactions are partitioned by month:
+
+    data/products.parquet
+    data/customers.parquet
+    data/transactions/month=2011-11/<uuid>-0.parquet
+
+(pyarrow names the part files; every append adds new ones next to the
+old) so a reader that asks for a few columns and a date range only opens
+those columns of the matching months. Without pyarrow (or
+DATASET_FORMAT=csv) the same functions read/write the plain
+data/<table>.csv files.
+The folder is DATASET_DIR, or ./data in the working directory (the repo
+root for the data/ scripts). Set DATASET_DIR when running a stage from
+anywhere else, e.g. ml-engine/ or backend/.
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# Not relative to this file: the package may be installed in site-packages
+DATA_DIR = os.path.abspath(os.getenv("DATASET_DIR", "data"))
+FORMAT = os.getenv("DATASET_FORMAT", "parquet" if HAS_PYARROW else "csv")
+
+DATE_COLUMN = "date"
+PARTITIONED = {"transactions": "month"}  # Table -> partition column
+
+
+def _path(name: str, fmt: str, data_dir: str) -> str:
+    if fmt == "csv":
+        return os.path.join(data_dir, f"{name}.csv")
+    if name in PARTITIONED:
+        return os.path.join(data_dir, name)
+    return os.path.join(data_dir, f"{name}.parquet")
+
+
+def locate(name: str, data_dir: str = DATA_DIR):
+    """(format, path) of an existing copy of `name`, preferring FORMAT."""
+    formats = [FORMAT] + [f for f in ("parquet", "csv") if f != FORMAT]
+    for fmt in formats:
+        if fmt == "parquet" and not HAS_PYARROW:
+            continue
+        path = _path(name, fmt, data_dir)
+        if os.path.exists(path):
+            return fmt, path
+    raise FileNotFoundError(
+        f"No '{name}' table in {data_dir}. Run process_real_data.py first."
+    )
+
+
+def exists(name: str, data_dir: str = DATA_DIR) -> bool:
+    try:
+        locate(name, data_dir)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _write_partitions(df: pd.DataFrame, name: str, path: str):
+    """Adds `df` to a month-partitioned dataset as new files (one per month)."""
+    partition = PARTITIONED[name]
+    dates = pd.to_datetime(df[DATE_COLUMN], format="ISO8601")
+    # Format each distinct month once, not every row
+    month = pd.Categorical(dates.dt.year * 100 + dates.dt.month)
+    month = month.rename_categories(
+        [f"{m // 100}-{m % 100:02d}" for m in month.categories]
+    )
+    frame = df.assign(**{DATE_COLUMN: dates, partition: month})
+    frame.to_parquet(path, partition_cols=[partition], index=False)
+
+
+def write_table(df: pd.DataFrame, name: str, data_dir: str = DATA_DIR) -> str:
+    """Replaces table `name` with `df` in the configured format. Returns its path."""
+    fmt = "parquet" if FORMAT == "parquet" and HAS_PYARROW else "csv"
+    path = _path(name, fmt, data_dir)
+
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif name in PARTITIONED:
+        if os.path.isdir(path):
+            shutil.rmtree(path)  # No stale months from a previous run
+        _write_partitions(df, name, path)
+    else:
+        df.to_parquet(path, index=False)
+    return path
+
+
+def drop_table(name: str, data_dir: str = DATA_DIR):
+    """Removes every stored copy (Parquet and CSV) of table `name`."""
+    for fmt in ("parquet", "csv"):
+        path = _path(name, fmt, data_dir)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+
+def append_table(df: pd.DataFrame, name: str, data_dir: str = DATA_DIR) -> str:
+    """
+    Adds `df` to table `name` in whatever format it is already stored in.
+    Partitioned Parquet gets new files in the matching month folders and
+    CSV gets appended lines; nothing already on disk is rewritten.
+    """
+    if not exists(name, data_dir):
+        return write_table(df, name, data_dir)
+
+    fmt, path = locate(name, data_dir)
+    if fmt == "csv":
+        df.to_csv(path, mode="a", header=False, index=False)
+    elif name in PARTITIONED:
+        _write_partitions(df, name, path)
+    else:
+        pd.concat([pd.read_parquet(path), df]).to_parquet(path, index=False)
+    return path
+
+
+def _month_filters(partition: str, start, end) -> list:
+    """Partition + row filters for start <= date < end."""
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        filters += [(partition, ">=", start.strftime("%Y-%m"))]
+        filters += [(DATE_COLUMN, ">=", start)]
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters += [(partition, "<=", end.strftime("%Y-%m"))]
+        filters += [(DATE_COLUMN, "<", end)]
+    return filters
+
+
+def read_table(
+    name: str, columns=None, start=None, end=None, data_dir: str = DATA_DIR
+) -> pd.DataFrame:
+    """
+    Loads `columns` (default: all) of table `name`. For the date-partitioned
+    tables, `start`/`end` restrict rows to start <= date < end and skip
+    whole months outside the range. Dates come back as datetime64.
+    """
+    fmt, path = locate(name, data_dir)
+    partition = PARTITIONED.get(name)
+    dated = partition is not None and (start is not None or end is not None)
+
+    if fmt == "parquet":
+        filters = _month_filters(partition, start, end) if dated else None
+        df = pd.read_parquet(path, columns=columns, filters=filters or None)
+        if partition in df.columns and (columns is None or partition not in columns):
+            df = df.drop(columns=partition)
+        return df
+
+    wanted = None
+    if columns is not None:
+        wanted = list(columns) + ([DATE_COLUMN] if dated else [])
+    df = pd.read_csv(path, usecols=lambda c: wanted is None or c in wanted)
+    if DATE_COLUMN in df.columns:
+        df[DATE_COLUMN] = pd.to_datetime(df[DATE_COLUMN], format="ISO8601")
+    if dated:
+        if start is not None:
+            df = df[df[DATE_COLUMN] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df[DATE_COLUMN] < pd.Timestamp(end)]
+    return df[columns].reset_index(drop=True) if columns is not None else df
+
+
+def iter_table(name: str, chunk_rows: int, columns=None, data_dir: str = DATA_DIR):
+    """Streams table `name` as DataFrames of at most `chunk_rows` rows."""
+    fmt, path = locate(name, data_dir)
+
+    if fmt == "csv":
+        usecols = None if columns is None else (lambda c: c in columns)
+        for chunk in pd.read_csv(path, chunksize=chunk_rows, usecols=usecols):
+            if DATE_COLUMN in chunk.columns:
+                chunk[DATE_COLUMN] = pd.to_datetime(
+                    chunk[DATE_COLUMN], format="ISO8601"
+                )
+            yield chunk
+        return
+
+    import pyarrow.dataset as ds
+
+    partitioning = "hive" if name in PARTITIONED else None
+    source = ds.dataset(path, format="parquet", partitioning=partitioning)
+    if columns is None:
+        columns = [c for c in source.schema.names if c != PARTITIONED.get(name)]
+    for batch in source.to_batches(columns=list(columns), batch_size=chunk_rows):
+        if batch.num_rows:
+            yield batch.to_pandas()
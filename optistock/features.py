@@ -0,0 +1,214 @@
+"""
+Shared demand-forecast feature engineering.
+
+Imported by the training scripts in ml-engine/ AND by the API
+(backend/forecasting.py, backend/training.py), so the features a model
+is trained on are exactly the features it is served.
+
+Every feature row describes a TARGET day d for one product and only looks
+at days before d, on a calendar-complete series (days without sales = 0):
+    lag_1          = units sold on d-1
+    lag_7          = units sold on d-7
+    rolling_mean_3 = mean units over d-3 .. d-1
+"""
+
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = [
+    "product_id",
+    "base_price",
+    "category_encoded",
+    "day_of_week",
+    "month",
+    "lag_1",
+    "lag_7",
+    "rolling_mean_3",
+]
+LAG_DAYS = (1, 7)
+ROLLING_WINDOW = 3
+HISTORY_DAYS = max(max(LAG_DAYS), ROLLING_WINDOW)  # Days needed before a target
+
+
+def daily_sales(transactions: pd.DataFrame, date_col: str = "date") -> pd.DataFrame:
+    """Raw sales -> units per product per calendar day."""
+    days = pd.to_datetime(transactions[date_col]).dt.normalize()
+    return (
+        transactions.assign(date=days)
+        .groupby(["product_id", "date"], as_index=False)["quantity"]
+        .sum()
+    )
+
+
+def daily_grid(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calendar-complete series: one row per product per day, from the
+    product's first to its last sale, missing days filled with 0.
+    Sorted by product then date; built with numpy only.
+    """
+    daily = daily[["product_id", "date", "quantity"]].copy()
+    daily["date"] = pd.to_datetime(daily["date"]).dt.normalize()
+
+    bounds = daily.groupby("product_id")["date"].agg(["min", "max"])
+    first = bounds["min"].to_numpy("datetime64[D]")
+    last = bounds["max"].to_numpy("datetime64[D]")
+    spans = (last - first).astype(int) + 1
+
+    # Position of every product's first day in the flat grid
+    starts = np.concatenate([[0], np.cumsum(spans)[:-1]])
+    offsets = np.arange(spans.sum()) - np.repeat(starts, spans)
+
+    grid = pd.DataFrame(
+        {
+            "product_id": np.repeat(bounds.index.to_numpy(), spans),
+            "date": np.repeat(first, spans) + offsets.astype("timedelta64[D]"),
+        }
+    )
+
+    # Scatter the sold quantities into their grid slots
+    quantity = np.zeros(len(grid))
+    group = bounds.index.get_indexer(daily["product_id"])
+    day = (daily["date"].to_numpy("datetime64[D]") - first[group]).astype(int)
+    np.add.at(quantity, starts[group] + day, daily["quantity"].to_numpy())
+    grid["quantity"] = quantity
+    grid["date"] = pd.to_datetime(grid["date"])
+    return grid
+
+
+def add_lag_features(grid: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds calendar features and lags to a `daily_grid` frame. Lags are
+    shifts over the flat numpy array, masked where they would cross into
+    the previous product; the rolling mean uses a cumulative sum.
+    Rows without enough history get NaN.
+    """
+    quantity = grid["quantity"].to_numpy(dtype=float)
+    product = grid["product_id"].to_numpy()
+    n = len(grid)
+
+    # Index of each row's first row within its product
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = product[1:] != product[:-1]
+    group_start = np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
+    position = np.arange(n) - group_start
+
+    out = grid.copy()
+    out["day_of_week"] = out["date"].dt.dayofweek
+    out["month"] = out["date"].dt.month
+
+    for lag in LAG_DAYS:
+        shifted = np.full(n, np.nan)
+        shifted[lag:] = quantity[:-lag]
+        out[f"lag_{lag}"] = np.where(position >= lag, shifted, np.nan)
+
+    csum = np.concatenate([[0.0], np.cumsum(quantity)])
+    window = np.arange(n)
+    rolling = (
+        csum[window] - csum[np.maximum(window - ROLLING_WINDOW, 0)]
+    ) / ROLLING_WINDOW
+    out[f"rolling_mean_{ROLLING_WINDOW}"] = np.where(
+        position >= ROLLING_WINDOW, rolling, np.nan
+    )
+    return out
+
+
+def training_rows(daily: pd.DataFrame, cached=None) -> pd.DataFrame:
+    """
+    Feature rows (with the target `quantity`) for every product-day that
+    has HISTORY_DAYS of history.
+    Incremental mode: pass the rows of a previous run as `cached`. Each
+    product then resumes at its own newest cached day (that day may have
+    been partial), and only the HISTORY_DAYS before it are put on the grid.
+    Products without cached rows are built from their first sale.
+    Returns the kept cached rows first, then the new ones.
+    """
+    if daily.empty:
+        return pd.DataFrame(
+            columns=["product_id", "date", "quantity", "day_of_week", "month"]
+            + [f"lag_{lag}" for lag in LAG_DAYS]
+            + [f"rolling_mean_{ROLLING_WINDOW}"]
+        )
+    if cached is None or cached.empty:
+        return _feature_rows(daily)
+
+    since = pd.to_datetime(cached["date"]).groupby(cached["product_id"]).max()
+    start = since - pd.Timedelta(days=HISTORY_DAYS)
+    dates = pd.to_datetime(daily["date"]).dt.normalize()
+    product_start = daily["product_id"].map(start)
+    in_window = product_start.isna() | (dates >= product_start)
+
+    # Products selling before their window get a 0 on its first day, so
+    # their series begin there instead of at the first sale inside it.
+    older = daily.loc[~in_window, "product_id"].unique()
+    window = pd.concat(
+        [
+            pd.DataFrame(
+                {"product_id": older, "date": start[older].to_numpy(), "quantity": 0.0}
+            ),
+            daily.loc[in_window, ["product_id", "date", "quantity"]],
+        ],
+        ignore_index=True,
+    )
+    rows = _feature_rows(window)
+    resume = rows["product_id"].map(since)
+    rows = rows[resume.isna() | (rows["date"] >= resume)]
+
+    kept = cached[pd.to_datetime(cached["date"]) < cached["product_id"].map(since)]
+    return pd.concat([kept, rows], ignore_index=True)
+
+
+def _feature_rows(daily: pd.DataFrame) -> pd.DataFrame:
+    rows = add_lag_features(daily_grid(daily)).dropna(
+        subset=["lag_7", "rolling_mean_3"]
+    )
+    return rows.reset_index(drop=True)
+
+
+def serving_rows(daily: pd.DataFrame, product_ids, as_of) -> pd.DataFrame:
+    """
+    Feature rows for the day AFTER `as_of` for each product in
+    `product_ids`. `as_of` is one date for all, or a Series indexed by
+    product_id (each product's own "Yesterday"). `daily` only needs the
+    last HISTORY_DAYS days before each as_of.
+    """
+    index = pd.Index(product_ids, name="product_id")
+    if isinstance(as_of, pd.Series):
+        as_of = pd.to_datetime(as_of).reindex(index).dt.normalize()
+    else:
+        as_of = pd.Series(pd.Timestamp(as_of).normalize(), index=index)
+
+    # (products x HISTORY_DAYS) grid, column k = units sold k days before as_of
+    grid = np.zeros((len(index), HISTORY_DAYS))
+    if not daily.empty:
+        row = index.get_indexer(daily["product_id"])
+        days = pd.to_datetime(daily["date"]).dt.normalize()
+        ref = as_of.to_numpy()[np.maximum(row, 0)]
+        col = ((ref - days.to_numpy()) / np.timedelta64(1, "D")).astype(float)
+        keep = (row >= 0) & (col >= 0) & (col < HISTORY_DAYS)
+        np.add.at(
+            grid,
+            (row[keep], col[keep].astype(int)),
+            daily["quantity"].to_numpy()[keep],
+        )
+
+    target = as_of + pd.Timedelta(days=1)
+    rows = pd.DataFrame(
+        {
+            "day_of_week": target.dt.dayofweek.to_numpy(),
+            "month": target.dt.month.to_numpy(),
+        },
+        index=index,
+    )
+    for lag in LAG_DAYS:
+        rows[f"lag_{lag}"] = grid[:, lag - 1]
+    rows[f"rolling_mean_{ROLLING_WINDOW}"] = grid[:, :ROLLING_WINDOW].mean(axis=1)
+    return rows
+
+
+def encode_categories(encoder, categories) -> np.ndarray:
+    """
+    Encodes a whole column of category labels in one step.
+    Unknown labels fall back to 0.
+    """
+    codes = pd.Categorical(categories, categories=encoder.classes_).codes
+    return np.where(codes < 0, 0, codes)